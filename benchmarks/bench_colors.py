@@ -0,0 +1,256 @@
+"""
+Compare the vectorized color engine (colors.ColorProgram) with the old per-LED path
+that went through utils.interpolate_color / utils.get_random_color for every LED.
+The old path is the baseline Controller.get_config_colors, copied verbatim; every
+deterministic preset is checked to render the same frame before it is timed.
+
+    python benchmarks/bench_colors.py [iterations]
+"""
+import datetime
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from config import NUMBER_OF_LEDS
+from colors import ColorProgram, ColorContext, frame_to_hex
+from utils import interpolate_color, get_random_color
+
+METRICS = {'cpu_temp': 55, 'gpu_temp': 48, 'cpu_usage': 42, 'gpu_usage': 17, 'cpu_speed': 3400, 'gpu_speed': 1200}
+MIN_VALUES = {'cpu_temp': 30, 'gpu_temp': 30, 'cpu_usage': 0, 'gpu_usage': 0, 'cpu_speed': 0, 'gpu_speed': 0}
+MAX_VALUES = {'cpu_temp': 90, 'gpu_temp': 90, 'cpu_usage': 100, 'gpu_usage': 100, 'cpu_speed': 5000, 'gpu_speed': 2500}
+
+PRESETS = {
+    "static": ["ffe000"] * NUMBER_OF_LEDS,
+    "usage": ["usage;00eeff:30;00ff00:50;ffe000:70;ff8000:90;ff0000:100"] * NUMBER_OF_LEDS,
+    "multi_stop": ["cpu_temp;00ff00:40;ffff00:60;ff0000:90"] * NUMBER_OF_LEDS,
+    "metric_gradient": ["00ff00-ff0000-cpu_temp"] * NUMBER_OF_LEDS,
+    "cycle": ["ff0000-00ff00-0000ff-ff00ff"] * NUMBER_OF_LEDS,
+    "wave": ["wave_ltr;ff0000-00ff00-0000ff"] * NUMBER_OF_LEDS,
+    "random": ["random"] * NUMBER_OF_LEDS,
+}
+
+
+class LegacyController:
+    """
+    Just enough of the pre-engine Controller to run its get_config_colors,
+    which is copied verbatim from the baseline controller.py.
+    """
+    def __init__(self, cpt, cycle_duration):
+        self.cpt = cpt
+        self.cycle_duration = cycle_duration
+        self.display_mode = "cpu"
+        self.metrics_min_value = MIN_VALUES
+        self.metrics_max_value = MAX_VALUES
+
+    def get_config_colors(self, config, key="metrics", metrics=None):
+        conf_colors = config.get(key, {}).get('colors')
+
+        # Normalize colors list length
+        if not conf_colors:
+            conf_colors = ["ffe000"] * NUMBER_OF_LEDS
+        elif len(conf_colors) != NUMBER_OF_LEDS:
+            # For usage mode, just repeat the first pattern across all LEDs silently
+            if key == "usage":
+                base = conf_colors[0]
+                conf_colors = [base] * NUMBER_OF_LEDS
+            else:
+                # Repeat/truncate pattern for other modes (keep a warning for non-usage)
+                print(f"Warning: config {key} colors length mismatch, normalizing to {NUMBER_OF_LEDS} LEDs.")
+                repeated = []
+                while len(repeated) < NUMBER_OF_LEDS:
+                    for c in conf_colors:
+                        repeated.append(c)
+                        if len(repeated) == NUMBER_OF_LEDS:
+                            break
+                conf_colors = repeated
+
+        if metrics is None:
+            metrics = self.metrics.get_metrics(self.temp_unit)
+        colors = []
+        for i, color in enumerate(conf_colors):
+                if color.lower() == "random":
+                    colors.append(get_random_color())
+                elif color.startswith("wave_"):
+                    wave_type, gradient = color.split(";", 1)
+                    colors_list = gradient.split('-')
+                    num_colors = len(colors_list)
+                    
+                    if num_colors >= 2:
+                        if colors_list[0] != colors_list[-1]:
+                            colors_list.append(colors_list[0])
+                        
+                        num_segments = len(colors_list) - 1
+                        total_duration = self.cycle_duration
+                        
+                        if wave_type == "wave_ltr":
+                            phase_shift = (i / NUMBER_OF_LEDS) * total_duration
+                        else: # wave_rtl
+                            phase_shift = ((NUMBER_OF_LEDS - i) / NUMBER_OF_LEDS) * total_duration
+                        
+                        time_in_cycle = (self.cpt + phase_shift) % total_duration
+                        
+                        if num_segments > 0:
+                            segment_duration = total_duration / num_segments
+                            segment_index = min(int(time_in_cycle / segment_duration), num_segments - 1)
+                            
+                            start_color = colors_list[segment_index]
+                            end_color = colors_list[segment_index + 1]
+                            
+                            time_in_segment = time_in_cycle - (segment_index * segment_duration)
+                            if segment_duration > 0:
+                                factor = time_in_segment / segment_duration
+                            else:
+                                factor = 0
+                            colors.append(interpolate_color(start_color, end_color, factor))
+                        else:
+                            colors.append(colors_list[0])
+                    else:
+                        colors.append(colors_list[0])
+                elif ";" in color:  # New multi-stop gradient format
+                    parts = color.split(';')
+                    metric = parts[0]
+                    stops = []
+                    for stop in parts[1:]:
+                        stop_parts = stop.split(':')
+                        stops.append({'color': stop_parts[0], 'value': int(stop_parts[1])})
+                    
+                    stops.sort(key=lambda x: x['value'])
+
+                    # Special non-interpolated usage bands
+                    if metric == "usage":
+                        # Decide which underlying metric to use based on display context
+                        usage_metric = "cpu_usage"
+                        if getattr(self, "display_mode", "cpu") == "gpu":
+                            usage_metric = "gpu_usage"
+                        elif getattr(self, "display_mode", "cpu") == "alternating":
+                            if getattr(self, "showing_cpu", True):
+                                usage_metric = "cpu_usage"
+                            else:
+                                usage_metric = "gpu_usage"
+
+                        if usage_metric not in metrics:
+                            print(f"Warning: {usage_metric} not found in metrics, using first color.")
+                            colors.append(stops[0]['color'])
+                            continue
+
+                        metric_value = metrics[usage_metric]
+
+                        # Choose first band whose threshold is strictly greater than the value;
+                        # if none match, fall back to the last band.
+                        chosen_color = stops[-1]['color']
+                        for band in stops:
+                            if metric_value < band['value']:
+                                chosen_color = band['color']
+                                break
+                        colors.append(chosen_color)
+                        continue
+
+                    if metric not in metrics:
+                        print(f"Warning: {metric} not found in metrics, using first color.")
+                        colors.append(stops[0]['color'])
+                        continue
+
+                    metric_value = metrics[metric]
+
+                    if metric_value <= stops[0]['value']:
+                        colors.append(stops[0]['color'])
+                        continue
+                    
+                    if metric_value >= stops[-1]['value']:
+                        colors.append(stops[-1]['color'])
+                        continue
+
+                    for j in range(len(stops) - 1):
+                        if stops[j]['value'] <= metric_value < stops[j+1]['value']:
+                            start_stop = stops[j]
+                            end_stop = stops[j+1]
+                            factor = (metric_value - start_stop['value']) / (end_stop['value'] - start_stop['value'])
+                            colors.append(interpolate_color(start_stop['color'], end_stop['color'], factor))
+                            break
+                elif "-" in color:
+                    split_color = color.split("-")
+                    if len(split_color) == 3:
+                        start_color, end_color, metric = split_color
+                        current_time = datetime.datetime.now()
+                        if metric == "seconds":
+                            factor = current_time.second / 59
+                        elif metric == "minutes":
+                            factor = current_time.minute / 59
+                        elif metric == "hours":
+                            factor = current_time.hour / 23
+                        else:
+                            if metric not in metrics:
+                                print(f"Warning: {metric} not found in metrics, using start color.")
+                                factor = 0
+                            elif self.metrics_min_value[metric] == self.metrics_max_value[metric]:
+                                print(f"Warning: {metric} min and max values are the same, using start color.")
+                                factor = 0
+                            else:
+                                metric_value = metrics[metric]
+                                min_val = self.metrics_min_value[metric]
+                                max_val = self.metrics_max_value[metric]
+                                factor = (metric_value - min_val) / (max_val - min_val)
+                                factor = max(0, min(1, factor)) # Clamp factor between 0 and 1
+                        colors.append(interpolate_color(start_color, end_color, factor))
+                    else:
+                        colors_list = split_color
+                        num_colors = len(colors_list)
+                        
+                        if num_colors >= 2:
+                            # Add first color to the end to make a loop
+                            if colors_list[0] != colors_list[-1]:
+                                colors_list.append(colors_list[0])
+                            
+                            num_segments = len(colors_list) - 1
+                            total_duration = self.cycle_duration # number of steps
+                            time_in_cycle = self.cpt % total_duration
+                            
+                            if num_segments > 0:
+                                segment_duration = total_duration / num_segments
+                                segment_index = min(int(time_in_cycle / segment_duration), num_segments - 1)
+                                
+                                start_color = colors_list[segment_index]
+                                end_color = colors_list[segment_index + 1]
+                                
+                                time_in_segment = time_in_cycle - (segment_index * segment_duration)
+                                if segment_duration > 0:
+                                    factor = time_in_segment / segment_duration
+                                else:
+                                    factor = 0
+                                colors.append(interpolate_color(start_color, end_color, factor))
+                            else:
+                                colors.append(colors_list[0])
+                        else:
+                            colors.append(colors_list[0])
+                else:
+                    colors.append(color)
+        return np.array(colors)
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    cycle_duration = 50
+    print(f"{'preset':<16}{'per-LED (us)':>14}{'engine (us)':>14}{'speedup':>10}")
+    for name, conf_colors in PRESETS.items():
+        program = ColorProgram(conf_colors)
+        # Same phase as frame 17 of 50 at the default 0.1 s frame interval
+        ctx = ColorContext(METRICS, 1.7, cycle_duration * 0.1, "cpu_usage", MIN_VALUES, MAX_VALUES, 0.1)
+        controller = LegacyController(17, cycle_duration)
+        config = {"metrics": {"colors": conf_colors}}
+        if name != "random":
+            expected = list(controller.get_config_colors(config, metrics=METRICS))
+            got = list(frame_to_hex(program.render(ctx)))
+            assert got == expected, f"{name}: engine {got[:3]}... != per-LED {expected[:3]}..."
+        legacy = timeit.timeit(lambda: controller.get_config_colors(config, metrics=METRICS), number=iterations)
+        engine = timeit.timeit(lambda: program.render(ctx), number=iterations)
+        legacy_us = legacy / iterations * 1e6
+        engine_us = engine / iterations * 1e6
+        print(f"{name:<16}{legacy_us:>14.1f}{engine_us:>14.1f}{legacy_us / engine_us:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+"""
+Time the render pipeline of controller.Controller against an in-memory HID device and fixed metrics:
+get_config_colors for each color spec family, the draw_*_phantom_spirit functions, send_packets and
+full display() iterations. Results are printed and written as JSON, to compare revisions.
+
+    python benchmarks/bench_pipeline.py [iterations] [output.json]
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import timeit
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+
+class FakeDevice:
+    """Stands in for hid.Device: records the reports written instead of sending them"""
+    def __init__(self, vid=None, pid=None, serial=None, path=None):
+        self.writes = 0
+        self.bytes_written = 0
+
+    def write(self, data):
+        self.writes += 1
+        self.bytes_written += len(data)
+        return len(data)
+
+    def close(self):
+        pass
+
+
+fake_hid = types.ModuleType('hid')
+fake_hid.Device = FakeDevice
+fake_hid.enumerate = lambda vid=0, pid=0: [{'path': b'/dev/hidraw-fake', 'serial_number': 'FAKE'}]
+sys.modules['hid'] = fake_hid
+
+import numpy as np
+import controller
+from config import NUMBER_OF_LEDS, default_config
+
+METRICS = {'cpu_temp': 55, 'gpu_temp': 48, 'cpu_usage': 42, 'gpu_usage': 17, 'cpu_speed': 3400, 'gpu_speed': 1200,
+           'cpu_usage_max': 97, 'cpu_temp_max': 71}
+
+
+class StubMetrics:
+    """Stands in for metrics.Metrics: fixed values, no sensors and no sampler thread"""
+    def __init__(self):
+        self.update_interval = 0.5
+
+    def get_metrics(self, temp_unit, reader=None):
+        return dict(METRICS, updated=False)
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def get_stats(self):
+        return {}
+
+    def collect_stats(self, text):
+        pass
+
+
+FAMILIES = {
+    "static": ["ffe000"] * NUMBER_OF_LEDS,
+    "usage_bands": ["usage;00eeff:30;00ff00:50;ffe000:70;ff8000:90;ff0000:100"] * NUMBER_OF_LEDS,
+    "multi_stop": ["cpu_temp;00ff00:40;ffff00:60;ff0000:90"] * NUMBER_OF_LEDS,
+    "metric_gradient": ["00ff00-ff0000-cpu_temp"] * NUMBER_OF_LEDS,
+    "cycle": ["ff0000-00ff00-0000ff-ff00ff"] * NUMBER_OF_LEDS,
+    "wave": ["wave_ltr;ff0000-00ff00-0000ff"] * NUMBER_OF_LEDS,
+    "wave_live": ["wave_ltr;ff0000-00ff00-0000ff;speed=1.5"] * NUMBER_OF_LEDS,
+    "random": ["random"] * NUMBER_OF_LEDS,
+    "time_gradient": ["ff0000-0000ff-seconds"] * NUMBER_OF_LEDS,
+}
+
+
+def measure(function, iterations, repeat=5):
+    """Mean and best per-call time in microseconds over repeat runs of iterations calls"""
+    function()  # warm up caches and compiled programs
+    runs = timeit.repeat(function, number=iterations, repeat=repeat)
+    return {
+        "mean_us": round(sum(runs) / (repeat * iterations) * 1e6, 3),
+        "best_us": round(min(runs) / iterations * 1e6, 3),
+    }
+
+
+def make_controller(config_path):
+    controller.Metrics = StubMetrics
+    c = controller.Controller(config_path=config_path)
+    c.devices.events = None  # no netlink traffic while timing
+    return c
+
+
+def bench_colors(c, iterations):
+    results = {}
+    for family, colors in FAMILIES.items():
+        config = dict(c.config, metrics={"colors": colors})
+        results[family] = measure(lambda: c.get_config_colors(config, key="metrics"), iterations)
+    return results
+
+
+def bench_draw(c, iterations):
+    def fresh(function):
+        def run():
+            c.leds = np.zeros(NUMBER_OF_LEDS, dtype=int)
+            function()
+        return run
+    results = {
+        "draw_usage_phantom_spirit": measure(fresh(lambda: c.draw_usage_phantom_spirit(142)), iterations),
+        "draw_speed_phantom_spirit": measure(fresh(lambda: c.draw_speed_phantom_spirit(3400)), iterations),
+        "draw_temp_phantom_spirit": measure(fresh(lambda: c.draw_temp_phantom_spirit(55)), iterations),
+        "draw_device_cached": measure(lambda: c.draw_device(42, 3400, 55), iterations),
+    }
+
+    def uncached():
+        c.mask_cache.masks.clear()
+        c.draw_device(42, 3400, 55)
+    results["draw_device_uncached"] = measure(uncached, iterations)
+    return results
+
+
+def bench_send(c, iterations):
+    c.dev = c.devices.get()
+    c.leds = c.full_leds
+    frames = [np.full((NUMBER_OF_LEDS, 3), i, dtype=np.uint8) for i in range(2)]
+    counter = [0]
+
+    def changed():
+        counter[0] += 1
+        c.colors = frames[counter[0] % 2]
+        c.send_packets()
+
+    def unchanged():
+        c.colors = frames[0]
+        c.send_packets()
+    results = {"send_packets_changed": measure(changed, iterations)}
+    c.keepalive_interval = float('inf')
+    results["send_packets_unchanged"] = measure(unchanged, iterations)
+    c.keepalive_interval = 1.0
+    return results
+
+
+class Stop(Exception):
+    pass
+
+
+def bench_display(c, iterations, repeat=5):
+    """Full display() iterations, the frame deadline sleep replaced by a counter"""
+    left = [0]
+
+    def sleep(seconds):
+        left[0] -= 1
+        if left[0] <= 0:
+            raise Stop
+
+    c.scheduler.sleep = sleep
+    runs = []
+    for _ in range(repeat):
+        left[0] = iterations
+        start = timeit.default_timer()
+        try:
+            c.display()
+        except Stop:
+            pass
+        runs.append(timeit.default_timer() - start)
+    return {"display_iteration": {
+        "mean_us": round(sum(runs) / (repeat * iterations) * 1e6, 3),
+        "best_us": round(min(runs) / iterations * 1e6, 3),
+    }}
+
+
+def revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    output = sys.argv[2] if len(sys.argv) > 2 else None
+    with tempfile.TemporaryDirectory() as directory:
+        config_path = os.path.join(directory, 'config.json')
+        config = dict(default_config, display_mode="cpu", color_mode="metrics")
+        config["metrics"] = {"colors": FAMILIES["wave"]}
+        with open(config_path, 'w') as f:
+            json.dump(config, f)
+        c = make_controller(config_path)
+        results = {}
+        results.update(bench_colors(c, iterations))
+        results.update(bench_draw(c, iterations))
+        results.update(bench_send(c, iterations))
+        results.update(bench_display(c, iterations))
+        c.writer.close()
+        c.config_watcher.close()
+
+    report = {
+        "revision": revision(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "iterations": iterations,
+        "results": results,
+    }
+    print(f"{'benchmark':<28}{'mean (us)':>12}{'best (us)':>12}")
+    for name, result in results.items():
+        print(f"{name:<28}{result['mean_us']:>12.1f}{result['best_us']:>12.1f}")
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
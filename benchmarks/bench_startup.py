@@ -0,0 +1,98 @@
+"""
+Time-to-first-frame of the controller: fresh interpreters construct a Controller against an in-memory
+HID device and render one frame. Cold runs start with an empty probe cache, warm runs reuse the one
+written by the previous start. Results are printed and, with an output path, written as JSON.
+
+    python benchmarks/bench_startup.py [runs] [output.json]
+
+The OS page cache stays warm between runs, so this tracks the controller's own startup cost rather
+than disk reads right after boot.
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r'''
+import json, sys, time, types
+start = time.perf_counter()
+sys.path.insert(0, {src!r})
+
+
+class Device:
+    def __init__(self, vid=None, pid=None, serial=None, path=None):
+        pass
+
+    def write(self, data):
+        return len(data)
+
+    def close(self):
+        pass
+
+
+hid = types.ModuleType('hid')
+hid.Device = Device
+hid.enumerate = lambda vid=0, pid=0: [{{'path': b'/dev/hidraw-fake', 'serial_number': 'FAKE'}}]
+sys.modules['hid'] = hid
+
+import controller
+imported = time.perf_counter()
+c = controller.Controller(config_path={config!r})
+created = time.perf_counter()
+c.render_frame()
+first_frame = time.perf_counter()
+print(json.dumps({{
+    "import_ms": (imported - start) * 1000,
+    "controller_ms": (created - imported) * 1000,
+    "first_frame_ms": (first_frame - created) * 1000,
+}}))
+'''
+
+
+def run_once(config_path, cache_home):
+    env = dict(os.environ, XDG_CACHE_HOME=cache_home)
+    code = CHILD.format(src=os.path.join(ROOT, 'src'), config=config_path)
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True, check=True)
+    total = (time.perf_counter() - started) * 1000
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings["total_ms"] = total
+    return timings
+
+
+def summarize(runs):
+    return {
+        key: {"mean": round(sum(run[key] for run in runs) / len(runs), 2), "best": round(min(run[key] for run in runs), 2)}
+        for key in runs[0]
+    }
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    output = sys.argv[2] if len(sys.argv) > 2 else None
+    config_path = os.path.join(ROOT, 'config.json')
+    cold, warm = [], []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as cache_home:
+            cold.append(run_once(config_path, cache_home))
+            warm.append(run_once(config_path, cache_home))
+    results = {"cold": summarize(cold), "warm": summarize(warm)}
+
+    print(f"{'start':<8}{'import':>10}{'controller':>12}{'1st frame':>11}{'total':>10}   (mean ms)")
+    for name, result in results.items():
+        print(f"{name:<8}{result['import_ms']['mean']:>10.1f}{result['controller_ms']['mean']:>12.1f}"
+              f"{result['first_frame_ms']['mean']:>11.1f}{result['total_ms']['mean']:>10.1f}")
+    if output:
+        report = {"python": platform.python_version(), "machine": platform.machine(), "runs": runs, "results": results}
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,468 @@
+import datetime
+import time
+import numpy as np
+from config import NUMBER_OF_LEDS
+
+# Default memory cap for precomputed animation cycles, in bytes
+DEFAULT_RING_BUDGET = 4 * 1024 * 1024
+# Largest metric range a gradient is tabulated over; wider ones are interpolated on each render
+MAX_GRADIENT_TABLE = 65536
+
+
+def hex_to_rgb(color):
+    """'ff8000' -> np.array([255, 128, 0])"""
+    if len(color) != 6:
+        raise ValueError(f"expected 6 hex digits, got {color!r}")
+    return np.array([int(color[i:i+2], 16) for i in (0, 2, 4)])
+
+
+def frame_to_hex(frame):
+    """Convert a (N, 3) uint8 frame back to a list of 'rrggbb' strings (e.g. for the Tk preview)."""
+    return [f"{r:02x}{g:02x}{b:02x}" for r, g, b in frame.tolist()]
+
+
+def interpolate_rgb(start_rgb, end_rgb, factor):
+    """Same arithmetic as utils.interpolate_color, on RGB arrays; factor may be a scalar or an (N,) array."""
+    factor = np.asarray(factor, dtype=float)[..., None]
+    return (start_rgb * (1 - factor) + end_rgb * factor).astype(int)
+
+
+class GradientTable:
+    """
+    Colors of a gradient at every integer value in low..high, as a (high - low + 1, 3) uint8 table.
+    color_at(values) evaluates the gradient on an array of values; values outside the range take
+    the color of the nearest end, so color_at must be flat beyond low and high.
+    """
+    def __init__(self, low, high, color_at):
+        self.low = low
+        self.high = high
+        self.table = color_at(np.arange(low, high + 1)).astype(np.uint8)
+
+    @classmethod
+    def build(cls, low, high, color_at):
+        """The table over floor(low)..ceil(high), or None if that range is over MAX_GRADIENT_TABLE"""
+        low, high = int(np.floor(low)), int(np.ceil(high))
+        if high - low + 1 > MAX_GRADIENT_TABLE:
+            return None
+        return cls(low, high, color_at)
+
+    def lookup(self, value):
+        """Color of an integer value, None for a fractional one (not in the table)"""
+        if value != int(value):
+            return None
+        return self.table[min(max(int(value), self.low), self.high) - self.low]
+
+
+class Timeline:
+    """Animation clock: seconds elapsed on the monotonic clock, independent of the frame rate."""
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.start = clock()
+
+    def now(self):
+        return self.clock() - self.start
+
+
+class ColorContext:
+    """
+    Per-frame values the color specs are evaluated against.
+    time and cycle_duration are in seconds; frame_interval is the expected time between frames.
+    """
+    def __init__(self, metrics, time, cycle_duration, usage_metric, min_values, max_values, frame_interval=0.1):
+        self.metrics = metrics
+        self.time = time
+        self.cycle_duration = cycle_duration
+        self.usage_metric = usage_metric
+        self.min_values = min_values
+        self.max_values = max_values
+        self.frame_interval = frame_interval
+
+
+class StaticColor:
+    refresh = None
+
+    def __init__(self, color):
+        self.rgb = hex_to_rgb(color)
+
+    def render(self, frame, indexes, ctx):
+        frame[indexes] = self.rgb
+
+
+class RandomColor:
+    refresh = "frame"
+
+    def render(self, frame, indexes, ctx):
+        frame[indexes] = np.random.randint(0, 256, size=(len(indexes), 3))
+
+
+class CycleGradient:
+    """
+    Loop through a list of colors every cycle_duration seconds (e.g. 'ff0000-00ff00-0000ff-ffffff').
+    speed multiplies the cycle rate and offset shifts it by a fraction of a cycle
+    (e.g. 'ff0000-0000ff;speed=2;offset=0.5').
+    """
+    refresh = "frame"
+
+    def __init__(self, colors_list, speed=1.0, offset=0.0):
+        self.palette = np.array([hex_to_rgb(c) for c in colors_list])
+        self.num_segments = len(colors_list) - 1
+        self.speed = speed
+        self.offset = offset
+
+    def time_in_cycle(self, time, total_duration):
+        return time * self.speed + self.offset * total_duration
+
+    def colors_at(self, time_in_cycle, total_duration):
+        segment_duration = total_duration / self.num_segments
+        segment_index = np.minimum((time_in_cycle / segment_duration).astype(int), self.num_segments - 1)
+        time_in_segment = time_in_cycle - (segment_index * segment_duration)
+        if segment_duration > 0:
+            factor = time_in_segment / segment_duration
+        else:
+            factor = np.zeros_like(time_in_segment)
+        return interpolate_rgb(self.palette[segment_index], self.palette[segment_index + 1], factor)
+
+    def render(self, frame, indexes, ctx):
+        time_in_cycle = np.array([self.time_in_cycle(ctx.time, ctx.cycle_duration) % ctx.cycle_duration])
+        frame[indexes] = self.colors_at(time_in_cycle, ctx.cycle_duration)[0]
+
+
+class WaveGradient(CycleGradient):
+    """Cycle gradient shifted along the LED strip (e.g. 'wave_ltr;ff0000-0000ff')."""
+    def __init__(self, colors_list, wave_type, speed=1.0, offset=0.0):
+        super().__init__(colors_list, speed, offset)
+        self.wave_type = wave_type
+
+    def render(self, frame, indexes, ctx):
+        total_duration = ctx.cycle_duration
+        if self.wave_type == "wave_ltr":
+            phase_shift = (indexes / NUMBER_OF_LEDS) * total_duration
+        else: # wave_rtl
+            phase_shift = ((NUMBER_OF_LEDS - indexes) / NUMBER_OF_LEDS) * total_duration
+        time_in_cycle = (self.time_in_cycle(ctx.time, total_duration) + phase_shift) % total_duration
+        frame[indexes] = self.colors_at(time_in_cycle, total_duration)
+
+
+class UsageBands:
+    """Non-interpolated bands on the displayed usage (e.g. 'usage;00ff00:50;ff0000:100')."""
+    refresh = "metrics"
+
+    def __init__(self, stops):
+        self.values = [value for value, _ in stops]
+        self.palette = np.array([hex_to_rgb(color) for _, color in stops])
+
+    def color(self, ctx):
+        usage_metric = ctx.usage_metric
+        if usage_metric not in ctx.metrics:
+            print(f"Warning: {usage_metric} not found in metrics, using first color.")
+            return self.palette[0]
+        metric_value = ctx.metrics[usage_metric]
+        # Choose first band whose threshold is strictly greater than the value;
+        # if none match, fall back to the last band.
+        for i, value in enumerate(self.values):
+            if metric_value < value:
+                return self.palette[i]
+        return self.palette[-1]
+
+    def render(self, frame, indexes, ctx):
+        frame[indexes] = self.color(ctx)
+
+
+class MultiStopGradient:
+    """
+    Interpolated gradient over sorted stops (e.g. 'cpu_temp;00ff00:40;ff0000:90').
+    Tabulated once over the stops' range, a render is then a single lookup.
+    """
+    refresh = "metrics"
+
+    def __init__(self, metric, stops):
+        self.metric = metric
+        self.values = [value for value, _ in stops]
+        self.palette = np.array([hex_to_rgb(color) for _, color in stops])
+        self.table = GradientTable.build(self.values[0], self.values[-1], self.colors_at)
+
+    def colors_at(self, metric_values):
+        """color() over an array of values"""
+        values = np.array(self.values)
+        if len(values) == 1:
+            return np.repeat(self.palette, len(metric_values), axis=0)
+        # Segment j holds values[j] <= value < values[j+1], as in color()
+        j = np.clip(np.searchsorted(values, metric_values, side='right') - 1, 0, len(values) - 2)
+        width = values[j + 1] - values[j]
+        factor = (metric_values - values[j]) / np.where(width == 0, 1, width)
+        colors = interpolate_rgb(self.palette[j], self.palette[j + 1], factor)
+        colors[metric_values >= values[-1]] = self.palette[-1]
+        colors[metric_values <= values[0]] = self.palette[0]
+        return colors
+
+    def color(self, ctx):
+        if self.metric not in ctx.metrics:
+            print(f"Warning: {self.metric} not found in metrics, using first color.")
+            return self.palette[0]
+        metric_value = ctx.metrics[self.metric]
+        if self.table is not None:
+            color = self.table.lookup(metric_value)
+            if color is not None:
+                return color
+        values = self.values
+        if metric_value <= values[0]:
+            return self.palette[0]
+        if metric_value >= values[-1]:
+            return self.palette[-1]
+        for j in range(len(values) - 1):
+            if values[j] <= metric_value < values[j+1]:
+                factor = (metric_value - values[j]) / (values[j+1] - values[j])
+                return interpolate_rgb(self.palette[j], self.palette[j+1], factor)
+
+    def render(self, frame, indexes, ctx):
+        frame[indexes] = self.color(ctx)
+
+
+class TimeGradient:
+    """Two color gradient following the wall clock (e.g. 'ff0000-0000ff-seconds')."""
+    divisors = {"seconds": 59, "minutes": 59, "hours": 23}
+
+    def __init__(self, start_color, end_color, unit):
+        self.start_rgb = hex_to_rgb(start_color)
+        self.end_rgb = hex_to_rgb(end_color)
+        self.unit = unit
+        # Smallest step of the wall clock this gradient can show, in seconds
+        self.refresh = {"seconds": 1, "minutes": 60, "hours": 3600}[unit]
+
+    def render(self, frame, indexes, ctx):
+        current_time = datetime.datetime.now()
+        factor = getattr(current_time, self.unit[:-1]) / self.divisors[self.unit]
+        frame[indexes] = interpolate_rgb(self.start_rgb, self.end_rgb, factor)
+
+
+class MetricGradient:
+    """
+    Two color gradient between the configured min/max of a metric (e.g. 'ff0000-0000ff-cpu_temp').
+    Tabulated over min..max, the table is rebuilt when the bounds change.
+    """
+    refresh = "metrics"
+
+    def __init__(self, start_color, end_color, metric):
+        self.start_rgb = hex_to_rgb(start_color)
+        self.end_rgb = hex_to_rgb(end_color)
+        self.metric = metric
+        self.table = None
+        self.bounds = None
+
+    def colors_at(self, metric_values, min_val, max_val):
+        factor = np.clip((metric_values - min_val) / (max_val - min_val), 0, 1)
+        return interpolate_rgb(self.start_rgb, self.end_rgb, factor)
+
+    def lookup(self, ctx):
+        """Color from the table for the current bounds, None if it can't be tabulated"""
+        metric = self.metric
+        if metric not in ctx.metrics or ctx.min_values[metric] == ctx.max_values[metric]:
+            return None
+        bounds = (ctx.min_values[metric], ctx.max_values[metric])
+        if bounds != self.bounds:
+            self.bounds = bounds
+            self.table = GradientTable.build(min(bounds), max(bounds), lambda values: self.colors_at(values, *bounds))
+        if self.table is None:
+            return None
+        return self.table.lookup(ctx.metrics[metric])
+
+    def render(self, frame, indexes, ctx):
+        color = self.lookup(ctx)
+        if color is not None:
+            frame[indexes] = color
+            return
+        metric = self.metric
+        if metric not in ctx.metrics:
+            print(f"Warning: {metric} not found in metrics, using start color.")
+            factor = 0
+        elif ctx.min_values[metric] == ctx.max_values[metric]:
+            print(f"Warning: {metric} min and max values are the same, using start color.")
+            factor = 0
+        else:
+            min_val = ctx.min_values[metric]
+            max_val = ctx.max_values[metric]
+            factor = (ctx.metrics[metric] - min_val) / (max_val - min_val)
+            factor = max(0, min(1, factor)) # Clamp factor between 0 and 1
+        frame[indexes] = interpolate_rgb(self.start_rgb, self.end_rgb, factor)
+
+
+def _looped(colors_list):
+    # Add first color to the end to make a loop
+    if colors_list[0] != colors_list[-1]:
+        colors_list = colors_list + [colors_list[0]]
+    return colors_list
+
+
+ANIMATION_OPTIONS = ("speed", "offset")
+
+
+def split_options(color):
+    """'wave_ltr;ff0000-0000ff;speed=2' -> ('wave_ltr;ff0000-0000ff', {'speed': 2.0})"""
+    parts = []
+    options = {}
+    for part in color.split(';'):
+        if '=' in part:
+            name, value = part.split('=', 1)
+            if name.strip() not in ANIMATION_OPTIONS:
+                raise ValueError(f"unknown option {name!r}, expected one of {ANIMATION_OPTIONS}")
+            options[name.strip()] = float(value)
+        else:
+            parts.append(part)
+    return ';'.join(parts), options
+
+
+def parse_color_spec(color):
+    """Parse one LED color string from config.json into a spec object."""
+    color, options = split_options(color)
+    if color.lower() == "random":
+        return RandomColor()
+    if color.startswith("wave_"):
+        wave_type, gradient = color.split(";", 1)
+        colors_list = gradient.split('-')
+        if len(colors_list) < 2:
+            return StaticColor(colors_list[0])
+        return WaveGradient(_looped(colors_list), wave_type, **options)
+    if ";" in color:
+        parts = color.split(';')
+        metric = parts[0]
+        stops = []
+        for stop in parts[1:]:
+            stop_parts = stop.split(':')
+            stops.append((int(stop_parts[1]), stop_parts[0]))
+        stops.sort(key=lambda x: x[0])
+        if metric == "usage":
+            return UsageBands(stops)
+        return MultiStopGradient(metric, stops)
+    if "-" in color:
+        split_color = color.split("-")
+        if len(split_color) == 3:
+            start_color, end_color, metric = split_color
+            if metric in TimeGradient.divisors:
+                return TimeGradient(start_color, end_color, metric)
+            return MetricGradient(start_color, end_color, metric)
+        return CycleGradient(_looped(split_color), **options)
+    return StaticColor(color)
+
+
+def normalize_colors(conf_colors, key):
+    """Return a list of exactly NUMBER_OF_LEDS color strings."""
+    if not conf_colors:
+        return ["ffe000"] * NUMBER_OF_LEDS
+    if len(conf_colors) == NUMBER_OF_LEDS:
+        return list(conf_colors)
+    # For usage mode, just repeat the first pattern across all LEDs silently
+    if key == "usage":
+        return [conf_colors[0]] * NUMBER_OF_LEDS
+    # Repeat/truncate pattern for other modes (keep a warning for non-usage)
+    print(f"Warning: config {key} colors length mismatch, normalizing to {NUMBER_OF_LEDS} LEDs.")
+    return [conf_colors[i % len(conf_colors)] for i in range(NUMBER_OF_LEDS)]
+
+
+class ColorProgram:
+    """
+    The colors list of one config section compiled into groups of LEDs sharing the same spec.
+    render() evaluates each group once, as array operations, into a (NUMBER_OF_LEDS, 3) uint8 frame.
+    Animated groups (waves and cycling gradients) only depend on the phase in the cycle, so one full
+    cycle of them, sampled every frame_interval, is precomputed into a (cycle_frames, NUMBER_OF_LEDS, 3)
+    ring when it fits in ring_budget bytes. Longer cycles, and specs whose speed is not a whole number
+    (their period doesn't divide the cycle), are evaluated live.
+    """
+    def __init__(self, conf_colors, key="metrics", ring_budget=DEFAULT_RING_BUDGET):
+        self.source = tuple(conf_colors) if conf_colors else ()
+        self.key = key
+        self.ring_budget = ring_budget
+        groups = {}
+        for i, color in enumerate(normalize_colors(conf_colors, key)):
+            # All random LEDs share one group so they are drawn in a single call
+            group_key = "random" if color.lower() == "random" else color
+            groups.setdefault(group_key, []).append(i)
+        self.groups = []
+        self.ring_groups = []
+        self.live_groups = []
+        for color, indexes in groups.items():
+            try:
+                spec = parse_color_spec(color)
+            except Exception as e:
+                print(f"Warning: invalid color spec {color!r} in {key}: {e}")
+                spec = StaticColor("000000")
+            if not isinstance(spec, CycleGradient):
+                self.groups.append((spec, np.array(indexes)))
+            elif float(spec.speed).is_integer():
+                self.ring_groups.append((spec, np.array(indexes)))
+            else:
+                self.live_groups.append((spec, np.array(indexes)))
+        self.frame = np.zeros((NUMBER_OF_LEDS, 3), dtype=np.uint8)
+        self.ring = None
+        self.ring_key = None
+
+    def matches(self, conf_colors):
+        return self.source == (tuple(conf_colors) if conf_colors else ())
+
+    def refresh_interval(self, frame_interval, metrics_interval):
+        """
+        Longest interval between renders that still shows every change of the frame, from each spec's
+        refresh: "frame" (animated or random), "metrics" (follows the sampled metrics), a number of
+        seconds (wall clock) or None (never changes). Returns (interval, reason), interval None if static.
+        """
+        intervals = {"frame": frame_interval, "metrics": metrics_interval}
+        refresh = None
+        for spec, _ in self.ring_groups + self.live_groups + self.groups:
+            interval = intervals.get(spec.refresh, spec.refresh)
+            if interval is not None and (refresh is None or interval < refresh[0]):
+                refresh = (interval, spec.refresh if isinstance(spec.refresh, str) else "clock")
+        return refresh or (None, "static")
+
+    def build_ring(self, cycle_duration, cycle_frames):
+        """One full cycle of the ring groups, or None if it doesn't fit in ring_budget"""
+        if not self.ring_groups:
+            return None
+        size = cycle_frames * NUMBER_OF_LEDS * 3
+        if size > self.ring_budget:
+            print(f"Animation cycle of {cycle_frames} frames needs {size} bytes, over the {self.ring_budget} bytes budget, "
+                  f"evaluating {self.key} animations live.")
+            return None
+        ring = np.zeros((cycle_frames, NUMBER_OF_LEDS, 3), dtype=np.uint8)
+        for phase in range(cycle_frames):
+            ctx = ColorContext(None, phase * cycle_duration / cycle_frames, cycle_duration, None, None, None)
+            for spec, indexes in self.ring_groups:
+                spec.render(ring[phase], indexes, ctx)
+        return ring
+
+    def render(self, ctx):
+        if self.ring_groups:
+            cycle_frames = max(1, round(ctx.cycle_duration / ctx.frame_interval))
+            if self.ring_key != (ctx.cycle_duration, cycle_frames):
+                self.ring = self.build_ring(ctx.cycle_duration, cycle_frames)
+                self.ring_key = (ctx.cycle_duration, cycle_frames)
+            if self.ring is not None:
+                phase = round(ctx.time / ctx.cycle_duration * cycle_frames) % cycle_frames
+                self.frame[:] = self.ring[phase]
+            else:
+                for spec, indexes in self.ring_groups:
+                    spec.render(self.frame, indexes, ctx)
+        for spec, indexes in self.live_groups:
+            spec.render(self.frame, indexes, ctx)
+        for spec, indexes in self.groups:
+            spec.render(self.frame, indexes, ctx)
+        return self.frame.copy()
+
+
+class ColorCompiler:
+    """Keeps one compiled ColorProgram per config section, recompiling only when its colors change."""
+    def __init__(self, ring_budget=DEFAULT_RING_BUDGET):
+        self.programs = {}
+        self.ring_budget = ring_budget
+
+    def get(self, config, key, scope=None, ring_budget=None):
+        """
+        scope keeps the programs of displays with their own color sections apart; ring_budget, when
+        given, overrides the compiler's for this scope (e.g. a display's own animation_cache_mb)
+        """
+        if ring_budget is None:
+            ring_budget = self.ring_budget
+        conf_colors = config.get(key, {}).get('colors')
+        program = self.programs.get((scope, key))
+        if program is None or not program.matches(conf_colors) or program.ring_budget != ring_budget:
+            program = ColorProgram(conf_colors, key, ring_budget)
+            self.programs[(scope, key)] = program
+        return program
@@ -45,6 +45,8 @@ default_config = {
     "update_interval": 0.1,
     "metrics_update_interval": 1.0,
     "cycle_duration": 5.0,
+    "keepalive_interval": 1.0,
+    "animation_cache_mb": 4.0,
     "gpu_min_temp": 30.0,
     "gpu_max_temp": 90.0,
     "cpu_min_temp": 30.0,
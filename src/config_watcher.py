@@ -0,0 +1,174 @@
+import ctypes
+import ctypes.util
+import json
+import os
+import struct
+import time
+
+# inotify event masks (see inotify(7))
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct('iIII')
+
+
+def validate_config(config):
+    """Raise ValueError if config can't be used by the controller, return it unchanged otherwise."""
+    if not isinstance(config, dict):
+        raise ValueError("top level must be a JSON object")
+    for key in ("update_interval", "metrics_update_interval", "cycle_duration", "animation_cache_mb", "stats_textfile_interval"):
+        if key in config:
+            value = config[key]
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+                raise ValueError(f"{key} must be a positive number, got {value!r}")
+    if "keepalive_interval" in config:
+        value = config["keepalive_interval"]
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+            raise ValueError(f"keepalive_interval must be a number >= 0, got {value!r}")
+    if "stats_textfile" in config and not isinstance(config["stats_textfile"], (str, type(None))):
+        raise ValueError(f"stats_textfile must be a path or null, got {config['stats_textfile']!r}")
+    for key in ("vendor_id", "product_id"):
+        if key in config:
+            try:
+                int(config[key], 16)
+            except (TypeError, ValueError):
+                raise ValueError(f"{key} must be a hex string, got {config[key]!r}")
+    for key in ("metrics", "time", "usage"):
+        if key in config:
+            section = config[key]
+            if not isinstance(section, dict) or not isinstance(section.get("colors", []), list):
+                raise ValueError(f"{key}.colors must be a list")
+            if not all(isinstance(c, str) for c in section.get("colors", [])):
+                raise ValueError(f"{key}.colors must only contain strings")
+    if "devices" in config:
+        if not isinstance(config["devices"], list):
+            raise ValueError("devices must be a list")
+        seen = {}
+        for i, device in enumerate(config["devices"]):
+            try:
+                # Each entry overrides the top level keys for one display
+                validate_config(device)
+                for key in ("name", "path", "serial"):
+                    if key in device and not isinstance(device[key], str):
+                        raise ValueError(f"{key} must be a string")
+                if "devices" in device:
+                    raise ValueError("devices can't be nested")
+                # Without a selector every entry would open the first display found
+                if not device.get("path") and not device.get("serial"):
+                    raise ValueError("path or serial is required")
+                # name (or serial/path when unnamed) is also the display's color scope, so it must be unique too
+                for key in ("name", "path", "serial"):
+                    if device.get(key):
+                        if (key, device[key]) in seen:
+                            raise ValueError(f"{key} {device[key]!r} is already used by devices[{seen[(key, device[key])]}]")
+                        seen[(key, device[key])] = i
+            except ValueError as e:
+                raise ValueError(f"devices[{i}]: {e}")
+    return config
+
+
+class InotifyWatch:
+    """Non-blocking inotify watch on the directory holding a file, so renames over the file are seen too."""
+    def __init__(self, path):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        directory = os.path.dirname(os.path.abspath(path))
+        self.name = os.path.basename(path).encode()
+        if libc.inotify_add_watch(self.fd, directory.encode(), WATCH_MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed on {directory}")
+
+    def changed(self):
+        """Drain pending events, return True if one of them concerns the watched file."""
+        changed = False
+        while True:
+            try:
+                data = os.read(self.fd, 4096)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset + EVENT_HEADER.size <= len(data):
+                _, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b'\0')
+                if name == self.name:
+                    changed = True
+                offset += EVENT_HEADER.size + length
+
+    def close(self):
+        os.close(self.fd)
+
+
+class ConfigWatcher:
+    """
+    Keeps a validated copy of config.json and reloads it only when the file changes.
+    Uses inotify where available and falls back to polling the file's inode/size/mtime.
+    Handles editors and led_control.sh replacing the file with `> tmp && mv tmp config.json`.
+    """
+    def __init__(self, path, poll_interval=0.5):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.config = None
+        self.generation = 0
+        self.last_poll = 0
+        self.signature = None
+        try:
+            self.inotify = InotifyWatch(path)
+        except Exception as e:
+            print(f"inotify not available, polling {path} for changes: {e}")
+            self.inotify = None
+        self.reload()
+
+    def file_signature(self):
+        try:
+            st = os.stat(self.path)
+            return (st.st_ino, st.st_size, st.st_mtime_ns)
+        except OSError:
+            return None
+
+    def reload(self):
+        """Load and validate the file, swapping it in only if it is valid and different."""
+        self.signature = self.file_signature()
+        try:
+            with open(self.path, 'r') as f:
+                config = validate_config(json.load(f))
+        except Exception as e:
+            if self.config is None:
+                print(f"Error loading config: {e}")
+            else:
+                print(f"Error reloading config, keeping previous one: {e}")
+            return False
+        if config == self.config:
+            return False
+        # Single reference assignment: readers see either the old or the new config, never a mix
+        self.config = config
+        self.generation += 1
+        return True
+
+    def check(self):
+        """Reload the config if the file changed since last check, return True if a new config was swapped in."""
+        if self.inotify is not None:
+            if not self.inotify.changed():
+                return False
+        else:
+            now = time.monotonic()
+            if now - self.last_poll < self.poll_interval:
+                return False
+            self.last_poll = now
+            if self.file_signature() == self.signature:
+                return False
+        return self.reload()
+
+    def get(self):
+        self.check()
+        return self.config
+
+    def close(self):
+        if self.inotify is not None:
+            self.inotify.close()
+            self.inotify = None
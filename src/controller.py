@@ -1,156 +1,165 @@
 import numpy as np
 from metrics import Metrics
 from config import leds_indexes, NUMBER_OF_LEDS, display_modes
-from utils import interpolate_color, get_random_color
+from config_watcher import ConfigWatcher
+from device import PacketEncoder, HidWriter, DeviceManager
+from segments import SegmentLayout, MaskCache
+from scheduler import FrameScheduler
+from colors import ColorCompiler, ColorContext, Timeline, hex_to_rgb, DEFAULT_RING_BUDGET
+from stats import Histogram, StageTimer, TextfileExporter
 import hid
 import time
-import datetime 
 import json
 import os
+import signal
 import sys
 
 
-digit_to_segments = {
-    0: ['a', 'b', 'c', 'd', 'e', 'f'],
-    1: ['b', 'c'],
-    2: ['a', 'b', 'g', 'e', 'd'],
-    3: ['a', 'b', 'g', 'c', 'd'],
-    4: ['f', 'g', 'b', 'c'],
-    5: ['a', 'f', 'g', 'c', 'd'],
-    6: ['a', 'f', 'g', 'e', 'c', 'd'],
-    7: ['a', 'b', 'c'],
-    8: ['a', 'b', 'c', 'd', 'e', 'f', 'g'],
-    9: ['a', 'b', 'g', 'f', 'c', 'd'],
-}
-
-digit_mask = np.array(
-    [
-        [1, 1, 1, 1, 1, 1, 1],  # 0
-        [1, 1, 1, 1, 1, 1, 1],  # 1
-        [1, 1, 1, 1, 1, 1, 1],  # 2
-        [1, 1, 1, 1, 1, 1, 1],  # 3
-        [1, 1, 1, 1, 1, 1, 1],  # 4
-        [1, 1, 1, 1, 1, 1, 1],  # 5
-        [1, 1, 1, 1, 1, 1, 1],  # 6
-        [1, 1, 1, 1, 1, 1, 1],  # 7
-        [1, 1, 1, 1, 1, 1, 1],  # 8
-        [1, 1, 1, 1, 1, 1, 1],  # 9
-        [1, 1, 1, 1, 1, 1, 1],  # nothing
-    ]
-)
-
-letter_mask = {
-    'H': [1, 0, 1, 1, 1, 0, 1],
-}
-
-
-
-def _number_to_array(number):
-    if number>=10:
-        return _number_to_array(int(number/10))+[number%10]
-    else:
-        return [number]
+# Stages of a frame timed by Controller.stages
+STAGES = ("config", "metrics", "colors", "draw", "send")
+
+# Keys of a "devices" config entry that select the device; the other keys override the config for it
+DEVICE_SELECTORS = ("name", "path", "serial")
+
+
+def resolve_config_path(config_path=None):
+    if config_path is None:
+        return os.environ.get('DIGITAL_LCD_CONFIG', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config.json'))
+    return config_path
 
-def get_number_array(temp, array_length=3, fill_value=-1):
-    if temp<0:
-        return [fill_value]*array_length
-    else:
-        narray = _number_to_array(temp)
-        if (len(narray)!=array_length):
-            if(len(narray)<array_length):
-                narray = np.concatenate([[fill_value]*(array_length-len(narray)),narray])
-            else:
-                narray = narray[1:]
-        return narray
 
 class Controller:
-    def __init__(self, config_path=None):
+    """
+    Drives one display. device is an entry of the config's "devices" list (selected by path or serial,
+    other keys override the config); metrics, color_compiler and config_watcher can be shared between
+    the controllers of several displays, see ControllerGroup.
+    """
+    def __init__(self, config_path=None, device=None, metrics=None, color_compiler=None, config_watcher=None):
         self.temp_unit = {"cpu": "celsius", "gpu": "celsius"}
-        self.metrics = Metrics()
+        self.metrics = metrics or Metrics()
+        self.device = device or {}
+        self.name = self.device.get("name") or self.device.get("serial") or self.device.get("path") or "default"
         self.VENDOR_ID = 0x0416   
         self.PRODUCT_ID = 0x8001 
-        self.dev = self.get_device()
-        self.HEADER = 'dadbdcdd000000000000000000000000fc0000ff'
-        self.leds = np.array([0] * NUMBER_OF_LEDS)
+        self.writer = HidWriter()
+        self.devices = DeviceManager(self.open_device, close_device=self.writer.retire)
+        self.dev = self.devices.get()
+        self.encoder = PacketEncoder()
+        self.blank_leds = MaskCache.freeze(np.zeros(NUMBER_OF_LEDS, dtype=int))
+        self.full_leds = MaskCache.freeze(np.ones(NUMBER_OF_LEDS, dtype=int))
+        self.leds = self.blank_leds
+        self.mask_cache = MaskCache()
         self.leds_indexes = leds_indexes
         # Configurable config path
-        if config_path is None:
-            self.config_path = os.environ.get('DIGITAL_LCD_CONFIG', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config.json'))
-        else:
-            self.config_path = config_path
-        self.cpt = 0  # For alternate_time cycling
-        self.cycle_duration = 50
+        self.config_path = resolve_config_path(config_path)
+        self.timeline = Timeline()  # Drives wave and cycling gradient animations
+        self.cycle_duration = 5.0
         self.display_mode = None
         self.metrics_updates = 0
         self.alternating_cycle_duration = 5
         self.showing_cpu = True  # Track which mode we're showing in alternating mode
-        self.colors = np.array(["ffe000"] * NUMBER_OF_LEDS)  # Will be set in update()
+        self.colors = np.tile(hex_to_rgb("ffe000"), (NUMBER_OF_LEDS, 1)).astype(np.uint8)  # Will be set in update()
+        self.color_compiler = color_compiler or ColorCompiler()
+        self.ring_budget = DEFAULT_RING_BUDGET  # This display's animation_cache_mb, passed to color_compiler
+        # Last frame written to the device, used to skip identical frames
+        self.last_frame = bytearray(len(self.encoder.buffer))
+        self.last_frame_dev = None
+        self.last_write_time = 0
+        self.keepalive_interval = 1.0
+        self.frames_sent = 0
+        self.frames_skipped = 0
+        self.render_time = Histogram()
+        self.stages = StageTimer(STAGES)
+        self.exporter = TextfileExporter()
+        self.frame_interval = 0.1  # How often display() wakes up, see choose_frame_interval()
+        self.frame_interval_reason = None
+        self.config_watcher = config_watcher or ConfigWatcher(self.config_path)
+        self.config_generation = None
+        self.config = None
+        self.current_metrics = {}
         self.layout = self.load_layout()
         self.update()
-
-    def load_config(self):
-        try:
-            with open(self.config_path, 'r') as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"Error loading config: {e}")
-            return None
+        self.scheduler = FrameScheduler(self.frame_interval)
+        self.metrics.start()
 
     def load_layout(self):
         try:
             layout_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'layout.json')
             with open(layout_path, 'r') as f:
-                return json.load(f)
+                return SegmentLayout(json.load(f))
         except Exception as e:
             print(f"Error loading layout: {e}")
             return None
 
-    def get_device(self):
-        try:
-            return hid.Device(self.VENDOR_ID, self.PRODUCT_ID)
-        except Exception as e:
-            print(f"Error initializing HID device: {e}")
-            return None
-
-    def set_leds(self, key, value):
-        try:
-            led_index = self.leds_indexes[key]
-            if isinstance(led_index, list):
-                if isinstance(value, (list, np.ndarray)):
-                    for i, idx in enumerate(led_index):
-                        if i < len(value):
-                            self.leds[idx] = value[i]
-                else:
-                    for idx in led_index:
-                        self.leds[idx] = value
-            else:
-                self.leds[led_index] = value
-        except KeyError:
-            print(f"Warning: Key {key} not found in leds_indexes.")
-        except Exception as e:
-            print(f"Warning: Error setting LEDs for {key}: {e}")
+    def open_device(self):
+        """(device, path), opened by path so a hidraw remove uevent can be matched against it"""
+        if self.device.get("path"):
+            path = self.device["path"].encode()
+        else:
+            serial = self.device.get("serial")
+            found = [entry for entry in hid.enumerate(self.VENDOR_ID, self.PRODUCT_ID)
+                     if serial is None or entry.get('serial_number') == serial]
+            if not found:
+                raise OSError(f"no device {self.VENDOR_ID:04x}:{self.PRODUCT_ID:04x}" + (f" with serial {serial}" if serial else ""))
+            path = found[0]['path']
+        return hid.Device(path=path), path
 
     def send_packets(self):
-        message = "".join([self.colors[i] if self.leds[i] != 0 else "000000" for i in range(NUMBER_OF_LEDS)])
-        packet0 = bytes.fromhex(self.HEADER+message[:128-len(self.HEADER)])
-        self.dev.write(packet0)
-        packets = message[88:]
-        for i in range(0,4):
-            packet = bytes.fromhex('00'+packets[i*128:(i+1)*128])
-            self.dev.write(packet)
-
-
-    def draw_number(self, number, num_digits, digits_mapping):
-        """Draw a number using the digit mapping from layout.json"""
-        number_str = f"{number:0{num_digits}d}"
-        for i, digit_char in enumerate(number_str):
-            if i < len(digits_mapping):
-                digit = int(digit_char)
-                segments_to_light = digit_to_segments[digit]
-                digit_map = digits_mapping[i]['map']
-                for segment_name in segments_to_light:
-                    segment_index = digit_map[segment_name]
-                    self.leds[segment_index] = 1
+        """
+        Queue the current frame for the writer thread; identical frames are skipped until keepalive_interval
+        elapses, or for good when it is 0 (no keepalive).
+        Returns immediately, the USB writes happen on the writer thread.
+        """
+        packets = self.encoder.encode(self.colors, self.leds)
+        now = time.monotonic()
+        if (self.encoder.buffer == self.last_frame and self.dev is self.last_frame_dev
+                and (self.keepalive_interval <= 0 or now - self.last_write_time < self.keepalive_interval)):
+            self.frames_skipped += 1
+            return False
+        self.writer.submit(self.dev, packets)
+        self.last_frame[:] = self.encoder.buffer
+        self.last_frame_dev = self.dev
+        self.last_write_time = now
+        self.frames_sent += 1
+        return True
+
+    def get_stats(self):
+        return {
+            "name": self.name,
+            "render_time": self.render_time.summary(),
+            "send_time": self.stages.histograms["send"].summary(),
+            "stages": self.stages.summary(),
+            "frames_sent": self.frames_sent,
+            "frames_skipped": self.frames_skipped,
+            "mask_cache_hits": self.mask_cache.hits,
+            "mask_cache_misses": self.mask_cache.misses,
+            "frame_interval": self.frame_interval,
+            "frame_interval_reason": self.frame_interval_reason,
+            "scheduler": self.scheduler.get_stats(),
+            "writer": self.writer.get_stats(),
+            "device": self.devices.get_stats(),
+            "metrics": self.metrics.get_stats(),
+        }
+
+    def collect_stats(self, text):
+        """Add this display's counters and timings to a stats.PrometheusText"""
+        labels = {"device": self.name}
+        text.add("frames_sent_total", "counter", self.frames_sent, labels, "Frames queued for the device")
+        text.add("frames_skipped_total", "counter", self.frames_skipped, labels, "Frames identical to the previous one, not sent")
+        for stage, histogram in self.stages.histograms.items():
+            text.histogram("stage_seconds", histogram, dict(labels, stage=stage), "Time spent per frame in each stage")
+        text.histogram("hid_write_seconds", self.writer.latency, labels, "Time to write one frame to the device")
+        text.add("hid_write_errors_total", "counter", self.writer.errors, labels, "Failed frame writes")
+        text.add("hid_frames_dropped_total", "counter", self.writer.frames_dropped, labels,
+                 "Frames replaced by a newer one before the device took them")
+        text.add("frame_interval_seconds", "gauge", self.frame_interval, labels, "Current time between frames")
+
+    def export_stats(self):
+        def collect(text):
+            self.collect_stats(text)
+            self.metrics.collect_stats(text)
+            self.scheduler.collect_stats(text)
+        self.exporter.maybe_write(collect)
 
     def draw_usage_phantom_spirit(self, usage):
         """Draw usage % with special handling for 100s digit LED"""
@@ -158,22 +167,14 @@ class Controller:
             return
         
         # Draw % LED
-        self.leds[self.layout['usage_percent_led']] = 1
+        self.leds[self.layout.usage_percent_led] = 1
         
         # Draw 1s and 10s digits (skip leading zeros)
-        usage_2digit = usage % 100
-        
-        # Always draw 1s digit
-        if len(self.layout['usage_1s_digit']) > 0:
-            self.draw_number(usage_2digit % 10, 1, self.layout['usage_1s_digit'])
-        
-        # Only draw 10s digit if usage >= 10 (skip leading zero)
-        if usage_2digit >= 10 and len(self.layout['usage_10s_digit']) > 0:
-            self.draw_number(usage_2digit // 10, 1, self.layout['usage_10s_digit'])
+        self.layout.draw(self.leds, "usage", usage % 100)
         
         # Light 100s LED if usage >= 100
         if usage >= 100:
-            self.leds[self.layout['usage_100s_led']] = 1
+            self.leds[self.layout.usage_100s_led] = 1
 
     def draw_speed_phantom_spirit(self, speed):
         """Draw 4-digit speed in MHz, skipping leading zeros"""
@@ -181,25 +182,11 @@ class Controller:
             return
         
         # Draw MHz LED
-        self.leds[self.layout['speed_mhz_led']] = 1
+        self.leds[self.layout.speed_mhz_led] = 1
         
         # Draw speed digits, skipping leading zeros
         # Always draw at least the 1s digit (even if 0)
-        if len(self.layout['speed_digits']) >= 4:
-            # Draw 1s digit (always)
-            self.draw_number(speed % 10, 1, [self.layout['speed_digits'][0]])
-            
-            # Draw 10s digit if speed >= 10
-            if speed >= 10:
-                self.draw_number((speed // 10) % 10, 1, [self.layout['speed_digits'][1]])
-            
-            # Draw 100s digit if speed >= 100
-            if speed >= 100:
-                self.draw_number((speed // 100) % 10, 1, [self.layout['speed_digits'][2]])
-            
-            # Draw 1000s digit if speed >= 1000
-            if speed >= 1000:
-                self.draw_number(speed // 1000, 1, [self.layout['speed_digits'][3]])
+        self.layout.draw(self.leds, "speed", speed)
 
     def draw_temp_phantom_spirit(self, temp, device='cpu', unit='celsius'):
         """Draw 3-digit temperature with CPU/GPU LED and unit, skipping leading zeros"""
@@ -208,29 +195,34 @@ class Controller:
         
         # Draw CPU or GPU LED
         if device == 'cpu':
-            self.leds[self.layout['temp_cpu_led']] = 1
+            self.leds[self.layout.temp_cpu_led] = 1
         else:
-            self.leds[self.layout['temp_gpu_led']] = 1
+            self.leds[self.layout.temp_gpu_led] = 1
         
         # Draw temperature digits, skipping leading zeros
         # Always draw 1s digit (even if 0)
-        if len(self.layout['temp_1s_digit']) > 0:
-            self.draw_number(temp % 10, 1, self.layout['temp_1s_digit'])
-        
-        # Only draw 10s digit if temp >= 10 (skip leading zero)
-        if temp >= 10 and len(self.layout['temp_10s_digit']) > 0:
-            self.draw_number((temp // 10) % 10, 1, self.layout['temp_10s_digit'])
-        
-        # Only draw 100s digit if temp >= 100 (skip leading zero)
-        if temp >= 100 and len(self.layout['temp_100s_digit']) > 0:
-            self.draw_number(temp // 100, 1, self.layout['temp_100s_digit'])
+        self.layout.draw(self.leds, "temp", temp)
         
         # Draw unit LED
         if unit == 'celsius':
-            self.leds[self.layout['temp_celsius']] = 1
+            self.leds[self.layout.temp_celsius] = 1
         else:
-            self.leds[self.layout['temp_fahrenheit']] = 1
-
+            self.leds[self.layout.temp_fahrenheit] = 1
+
+
+    def draw_device(self, usage, speed, temp, device='cpu', unit='celsius'):
+        """Set self.leds to the read-only mask for these values, drawing it only on a cache miss"""
+        started = time.perf_counter()
+        key = (self.display_mode, usage, speed, temp, unit, device)
+        mask = self.mask_cache.get(key)
+        if mask is None:
+            self.leds = np.zeros(NUMBER_OF_LEDS, dtype=int)
+            self.draw_usage_phantom_spirit(usage)
+            self.draw_speed_phantom_spirit(speed)
+            self.draw_temp_phantom_spirit(temp, device=device, unit=unit)
+            mask = self.mask_cache.put(key, self.leds)
+        self.leds = mask
+        self.stages.add("draw", time.perf_counter() - started)
 
     def display_cpu_mode(self):
         """Display CPU temp, frequency, and usage"""
@@ -239,24 +231,16 @@ class Controller:
             return
 
         cpu_unit = self.config.get('cpu_temperature_unit', 'celsius')
-        gpu_unit = self.config.get('gpu_temperature_unit', 'celsius')
-        temp_unit = {'cpu': cpu_unit, 'gpu': gpu_unit}
 
-        metrics = self.metrics.get_metrics(temp_unit=temp_unit)
+        metrics = self.current_metrics
         self.colors = self.get_config_colors(self.config, key=getattr(self, "color_mode", "metrics"), metrics=metrics)
 
         cpu_usage = metrics.get("cpu_usage", 0)
         cpu_speed = metrics.get("cpu_speed", 0)
         cpu_temp = metrics.get("cpu_temp", 0)
 
-        # Draw usage %
-        self.draw_usage_phantom_spirit(cpu_usage)
-        
-        # Draw speed (frequency)
-        self.draw_speed_phantom_spirit(cpu_speed)
-        
-        # Draw temperature (CPU)
-        self.draw_temp_phantom_spirit(cpu_temp, device='cpu', unit=cpu_unit)
+        # Draw usage %, speed (frequency) and temperature (CPU)
+        self.draw_device(cpu_usage, cpu_speed, cpu_temp, device='cpu', unit=cpu_unit)
 
     def display_gpu_mode(self):
         """Display GPU temp, frequency, and usage"""
@@ -264,25 +248,17 @@ class Controller:
             print("Warning: layout.json not loaded. Cannot display GPU mode.")
             return
 
-        cpu_unit = self.config.get('cpu_temperature_unit', 'celsius')
         gpu_unit = self.config.get('gpu_temperature_unit', 'celsius')
-        temp_unit = {'cpu': cpu_unit, 'gpu': gpu_unit}
 
-        metrics = self.metrics.get_metrics(temp_unit=temp_unit)
+        metrics = self.current_metrics
         self.colors = self.get_config_colors(self.config, key=getattr(self, "color_mode", "metrics"), metrics=metrics)
 
         gpu_usage = metrics.get("gpu_usage", 0)
         gpu_speed = metrics.get("gpu_speed", 0)
         gpu_temp = metrics.get("gpu_temp", 0)
 
-        # Draw usage %
-        self.draw_usage_phantom_spirit(gpu_usage)
-        
-        # Draw speed (frequency)
-        self.draw_speed_phantom_spirit(gpu_speed)
-        
-        # Draw temperature (GPU)
-        self.draw_temp_phantom_spirit(gpu_temp, device='gpu', unit=gpu_unit)
+        # Draw usage %, speed (frequency) and temperature (GPU)
+        self.draw_device(gpu_usage, gpu_speed, gpu_temp, device='gpu', unit=gpu_unit)
 
     def display_alternating(self, metrics_updated):
         """Alternate between CPU and GPU modes based on number of metrics updates"""
@@ -292,7 +268,6 @@ class Controller:
 
         cpu_unit = self.config.get('cpu_temperature_unit', 'celsius')
         gpu_unit = self.config.get('gpu_temperature_unit', 'celsius')
-        temp_unit = {'cpu': cpu_unit, 'gpu': gpu_unit}
 
         if metrics_updated:
             self.metrics_updates += 1
@@ -300,7 +275,7 @@ class Controller:
                 self.metrics_updates = 0
                 self.showing_cpu = not self.showing_cpu
         # Get metrics
-        metrics = self.metrics.get_metrics(temp_unit=temp_unit)
+        metrics = self.current_metrics
 
         # Get colors based on current metrics
         self.colors = self.get_config_colors(self.config, key=getattr(self, "color_mode", "metrics"), metrics=metrics)
@@ -311,206 +286,38 @@ class Controller:
             cpu_usage = metrics.get("cpu_usage", 0)
             cpu_speed = metrics.get("cpu_speed", 0)
             cpu_temp = metrics.get("cpu_temp", 0)
-            self.draw_usage_phantom_spirit(cpu_usage)
-            self.draw_speed_phantom_spirit(cpu_speed)
-            self.draw_temp_phantom_spirit(cpu_temp, device='cpu', unit=cpu_unit)
+            self.draw_device(cpu_usage, cpu_speed, cpu_temp, device='cpu', unit=cpu_unit)
         else:
             # Display GPU mode
             gpu_usage = metrics.get("gpu_usage", 0)
             gpu_speed = metrics.get("gpu_speed", 0)
             gpu_temp = metrics.get("gpu_temp", 0)
-            self.draw_usage_phantom_spirit(gpu_usage)
-            self.draw_speed_phantom_spirit(gpu_speed)
-            self.draw_temp_phantom_spirit(gpu_temp, device='gpu', unit=gpu_unit)
-
-    def get_config_colors(self, config, key="metrics", metrics=None):
-        conf_colors = config.get(key, {}).get('colors')
-
-        # Normalize colors list length
-        if not conf_colors:
-            conf_colors = ["ffe000"] * NUMBER_OF_LEDS
-        elif len(conf_colors) != NUMBER_OF_LEDS:
-            # For usage mode, just repeat the first pattern across all LEDs silently
-            if key == "usage":
-                base = conf_colors[0]
-                conf_colors = [base] * NUMBER_OF_LEDS
+            self.draw_device(gpu_usage, gpu_speed, gpu_temp, device='gpu', unit=gpu_unit)
+
+    def get_usage_metric(self):
+        """Decide which underlying metric 'usage' bands follow based on display context"""
+        if getattr(self, "display_mode", "cpu") == "gpu":
+            return "gpu_usage"
+        elif getattr(self, "display_mode", "cpu") == "alternating":
+            if getattr(self, "showing_cpu", True):
+                return "cpu_usage"
             else:
-                # Repeat/truncate pattern for other modes (keep a warning for non-usage)
-                print(f"Warning: config {key} colors length mismatch, normalizing to {NUMBER_OF_LEDS} LEDs.")
-                repeated = []
-                while len(repeated) < NUMBER_OF_LEDS:
-                    for c in conf_colors:
-                        repeated.append(c)
-                        if len(repeated) == NUMBER_OF_LEDS:
-                            break
-                conf_colors = repeated
+                return "gpu_usage"
+        return "cpu_usage"
 
+    def get_config_colors(self, config, key="metrics", metrics=None):
         if metrics is None:
-            metrics = self.metrics.get_metrics(self.temp_unit)
-        colors = []
-        for i, color in enumerate(conf_colors):
-                if color.lower() == "random":
-                    colors.append(get_random_color())
-                elif color.startswith("wave_"):
-                    wave_type, gradient = color.split(";", 1)
-                    colors_list = gradient.split('-')
-                    num_colors = len(colors_list)
-                    
-                    if num_colors >= 2:
-                        if colors_list[0] != colors_list[-1]:
-                            colors_list.append(colors_list[0])
-                        
-                        num_segments = len(colors_list) - 1
-                        total_duration = self.cycle_duration
-                        
-                        if wave_type == "wave_ltr":
-                            phase_shift = (i / NUMBER_OF_LEDS) * total_duration
-                        else: # wave_rtl
-                            phase_shift = ((NUMBER_OF_LEDS - i) / NUMBER_OF_LEDS) * total_duration
-                        
-                        time_in_cycle = (self.cpt + phase_shift) % total_duration
-                        
-                        if num_segments > 0:
-                            segment_duration = total_duration / num_segments
-                            segment_index = min(int(time_in_cycle / segment_duration), num_segments - 1)
-                            
-                            start_color = colors_list[segment_index]
-                            end_color = colors_list[segment_index + 1]
-                            
-                            time_in_segment = time_in_cycle - (segment_index * segment_duration)
-                            if segment_duration > 0:
-                                factor = time_in_segment / segment_duration
-                            else:
-                                factor = 0
-                            colors.append(interpolate_color(start_color, end_color, factor))
-                        else:
-                            colors.append(colors_list[0])
-                    else:
-                        colors.append(colors_list[0])
-                elif ";" in color:  # New multi-stop gradient format
-                    parts = color.split(';')
-                    metric = parts[0]
-                    stops = []
-                    for stop in parts[1:]:
-                        stop_parts = stop.split(':')
-                        stops.append({'color': stop_parts[0], 'value': int(stop_parts[1])})
-                    
-                    stops.sort(key=lambda x: x['value'])
-
-                    # Special non-interpolated usage bands
-                    if metric == "usage":
-                        # Decide which underlying metric to use based on display context
-                        usage_metric = "cpu_usage"
-                        if getattr(self, "display_mode", "cpu") == "gpu":
-                            usage_metric = "gpu_usage"
-                        elif getattr(self, "display_mode", "cpu") == "alternating":
-                            if getattr(self, "showing_cpu", True):
-                                usage_metric = "cpu_usage"
-                            else:
-                                usage_metric = "gpu_usage"
-
-                        if usage_metric not in metrics:
-                            print(f"Warning: {usage_metric} not found in metrics, using first color.")
-                            colors.append(stops[0]['color'])
-                            continue
-
-                        metric_value = metrics[usage_metric]
-
-                        # Choose first band whose threshold is strictly greater than the value;
-                        # if none match, fall back to the last band.
-                        chosen_color = stops[-1]['color']
-                        for band in stops:
-                            if metric_value < band['value']:
-                                chosen_color = band['color']
-                                break
-                        colors.append(chosen_color)
-                        continue
-
-                    if metric not in metrics:
-                        print(f"Warning: {metric} not found in metrics, using first color.")
-                        colors.append(stops[0]['color'])
-                        continue
-
-                    metric_value = metrics[metric]
-
-                    if metric_value <= stops[0]['value']:
-                        colors.append(stops[0]['color'])
-                        continue
-                    
-                    if metric_value >= stops[-1]['value']:
-                        colors.append(stops[-1]['color'])
-                        continue
-
-                    for j in range(len(stops) - 1):
-                        if stops[j]['value'] <= metric_value < stops[j+1]['value']:
-                            start_stop = stops[j]
-                            end_stop = stops[j+1]
-                            factor = (metric_value - start_stop['value']) / (end_stop['value'] - start_stop['value'])
-                            colors.append(interpolate_color(start_stop['color'], end_stop['color'], factor))
-                            break
-                elif "-" in color:
-                    split_color = color.split("-")
-                    if len(split_color) == 3:
-                        start_color, end_color, metric = split_color
-                        current_time = datetime.datetime.now()
-                        if metric == "seconds":
-                            factor = current_time.second / 59
-                        elif metric == "minutes":
-                            factor = current_time.minute / 59
-                        elif metric == "hours":
-                            factor = current_time.hour / 23
-                        else:
-                            if metric not in metrics:
-                                print(f"Warning: {metric} not found in metrics, using start color.")
-                                factor = 0
-                            elif self.metrics_min_value[metric] == self.metrics_max_value[metric]:
-                                print(f"Warning: {metric} min and max values are the same, using start color.")
-                                factor = 0
-                            else:
-                                metric_value = metrics[metric]
-                                min_val = self.metrics_min_value[metric]
-                                max_val = self.metrics_max_value[metric]
-                                factor = (metric_value - min_val) / (max_val - min_val)
-                                factor = max(0, min(1, factor)) # Clamp factor between 0 and 1
-                        colors.append(interpolate_color(start_color, end_color, factor))
-                    else:
-                        colors_list = split_color
-                        num_colors = len(colors_list)
-                        
-                        if num_colors >= 2:
-                            # Add first color to the end to make a loop
-                            if colors_list[0] != colors_list[-1]:
-                                colors_list.append(colors_list[0])
-                            
-                            num_segments = len(colors_list) - 1
-                            total_duration = self.cycle_duration # number of steps
-                            time_in_cycle = self.cpt % total_duration
-                            
-                            if num_segments > 0:
-                                segment_duration = total_duration / num_segments
-                                segment_index = min(int(time_in_cycle / segment_duration), num_segments - 1)
-                                
-                                start_color = colors_list[segment_index]
-                                end_color = colors_list[segment_index + 1]
-                                
-                                time_in_segment = time_in_cycle - (segment_index * segment_duration)
-                                if segment_duration > 0:
-                                    factor = time_in_segment / segment_duration
-                                else:
-                                    factor = 0
-                                colors.append(interpolate_color(start_color, end_color, factor))
-                            else:
-                                colors.append(colors_list[0])
-                        else:
-                            colors.append(colors_list[0])
-                else:
-                    colors.append(color)
-        return np.array(colors)
+            metrics = self.current_metrics
+        started = time.perf_counter()
+        program = self.color_compiler.get(config, key, scope=self.name, ring_budget=self.ring_budget)
+        ctx = ColorContext(metrics, self.timeline.now(), self.cycle_duration, self.get_usage_metric(),
+                           self.metrics_min_value, self.metrics_max_value, self.update_interval)
+        colors = program.render(ctx)
+        self.stages.add("colors", time.perf_counter() - started)
+        return colors
     
-    def update(self):
-        self.leds = np.array([0] * NUMBER_OF_LEDS)
-        self.config = self.load_config()
-        updated = False
+    def apply_config(self):
+        """Derive controller settings from self.config; only runs when the config file actually changed."""
         if self.config:
             VENDOR_ID = int(self.config.get('vendor_id', "0x0416"),16)
             PRODUCT_ID = int(self.config.get('product_id', "0x8001"),16)
@@ -521,6 +328,8 @@ class Controller:
                 "gpu_usage": self.config.get('gpu_max_usage', 100),
                 "cpu_speed": self.config.get('cpu_max_speed', 5000),
                 "gpu_speed": self.config.get('gpu_max_speed', 2500),
+                "cpu_usage_max": self.config.get('cpu_max_usage', 100),
+                "cpu_temp_max": self.config.get('cpu_max_temp', 90),
             }
             self.metrics_min_value = {
                 "cpu_temp": self.config.get('cpu_min_temp', 30),
@@ -529,18 +338,19 @@ class Controller:
                 "gpu_usage": self.config.get('gpu_min_usage', 0),
                 "cpu_speed": self.config.get('cpu_min_speed', 0),
                 "gpu_speed": self.config.get('gpu_min_speed', 0),
+                "cpu_usage_max": self.config.get('cpu_min_usage', 0),
+                "cpu_temp_max": self.config.get('cpu_min_temp', 30),
             }
             self.display_mode = self.config.get('display_mode', 'cpu')
             self.color_mode = self.config.get('color_mode', 'usage')
                 
             self.temp_unit = {device: self.config.get(f"{device}_temperature_unit", "celsius") for device in ["cpu", "gpu"]}
-            metrics = self.metrics.get_metrics(temp_unit=self.temp_unit)
-            updated = metrics['updated']
-            self.metrics_colors = self.get_config_colors(self.config, key="metrics", metrics=metrics)
-            self.time_colors = self.get_config_colors(self.config, key="time", metrics=metrics)
             self.update_interval = self.config.get('update_interval', 0.1)
-            self.cycle_duration = int(self.config.get('cycle_duration', 5)/self.update_interval)
+            self.cycle_duration = self.config.get('cycle_duration', 5)
             self.metrics.update_interval = self.config.get('metrics_update_interval', 0.5)
+            self.keepalive_interval = self.config.get('keepalive_interval', 1.0)
+            self.exporter.configure(self.config.get('stats_textfile'), self.config.get('stats_textfile_interval', 15.0))
+            self.ring_budget = int(self.config.get('animation_cache_mb', 4.0) * 1024 * 1024)
             self.leds_indexes = leds_indexes
             if self.display_mode not in display_modes:
                 print(f"Warning: Display mode {self.display_mode} not compatible, switching to cpu.")
@@ -555,6 +365,8 @@ class Controller:
                 "gpu_usage": 100,
                 "cpu_speed": 5000,
                 "gpu_speed": 2500,
+                "cpu_usage_max": 100,
+                "cpu_temp_max": 90,
             }
             self.metrics_min_value = {
                 "cpu_temp": 30,
@@ -563,14 +375,17 @@ class Controller:
                 "gpu_usage": 0,
                 "cpu_speed": 0,
                 "gpu_speed": 0,
+                "cpu_usage_max": 0,
+                "cpu_temp_max": 30,
             }
             self.display_mode = 'cpu'
             self.color_mode = 'metrics'
-            self.time_colors = np.array(["ffe000"] * NUMBER_OF_LEDS)
-            self.metrics_colors = np.array(["ff0000"] * NUMBER_OF_LEDS)
+            self.metrics_colors = np.tile(hex_to_rgb("ff0000"), (NUMBER_OF_LEDS, 1)).astype(np.uint8)
             self.update_interval = 0.1
-            self.cycle_duration = int(5/self.update_interval)
+            self.cycle_duration = 5.0
             self.metrics.update_interval = 0.5
+            self.keepalive_interval = 1.0
+            self.ring_budget = DEFAULT_RING_BUDGET
             self.leds_indexes = leds_indexes
         
 
@@ -578,39 +393,206 @@ class Controller:
             print(f"Warning: Config VENDOR_ID or PRODUCT_ID changed, reinitializing device.")
             self.VENDOR_ID = VENDOR_ID
             self.PRODUCT_ID = PRODUCT_ID
-            self.dev = self.get_device()
+            self.dev = self.devices.reopen()
+        self.choose_frame_interval()
+
+    def choose_frame_interval(self):
+        """
+        Wake up only as often as the displayed frame can change: every update_interval when the
+        displayed colors animate, otherwise at the metrics rate (digits and metric colors only change
+        with a new sample) or faster if a wall clock gradient or the keepalive needs it.
+        """
+        if self.config:
+            key = "metrics" if self.display_mode == "debug_ui" else self.color_mode
+            program = self.color_compiler.get(self.config, key, scope=self.name, ring_budget=self.ring_budget)
+            interval, reason = program.refresh_interval(self.update_interval, self.metrics.update_interval)
+        else:
+            interval, reason = None, "static"
+        if interval is None or interval > self.metrics.update_interval:
+            interval, reason = self.metrics.update_interval, "metrics"
+        if 0 < self.keepalive_interval < interval:
+            interval, reason = self.keepalive_interval, "keepalive"
+        interval = max(interval, self.update_interval)
+        if (interval, reason) != (self.frame_interval, self.frame_interval_reason):
+            print(f"Frame interval set to {interval}s ({reason}).")
+        self.frame_interval = interval
+        self.frame_interval_reason = reason
+
+    def device_config(self, config):
+        """The config with this display's overrides from its "devices" entry applied"""
+        overrides = {key: value for key, value in self.device.items() if key not in DEVICE_SELECTORS}
+        if config is None or not overrides:
+            return config
+        return {**config, **overrides}
 
+    def update(self):
+        self.leds = self.blank_leds
+        started = time.perf_counter()
+        config = self.config_watcher.get()
+        if self.config_generation != self.config_watcher.generation:
+            self.config_generation = self.config_watcher.generation
+            self.config = self.device_config(config)
+            self.apply_config()
+        self.stages.add("config", time.perf_counter() - started)
+        updated = False
+        if self.config:
+            started = time.perf_counter()
+            # Latest snapshot published by the sampler thread, never blocks on a sensor
+            metrics = self.metrics.get_metrics(temp_unit=self.temp_unit, reader=self)
+            self.stages.add("metrics", time.perf_counter() - started)
+            self.current_metrics = metrics
+            updated = metrics['updated']
         return updated
 
+    def render_frame(self):
+        """Render the current frame and queue it for the device; returns False if the device isn't available"""
+        metrics_updated = self.update()
+        if self.dev is not None and self.dev is self.writer.failed:
+            # The writer thread lost the device, it is reopened after a short backoff
+            self.devices.lost(self.dev)
+        self.dev = self.devices.get()
+        if self.dev is None:
+            self.stages.end_frame()
+            return False
+
+        started = time.monotonic()
+        # existing display logic...
+        if self.display_mode == "cpu":
+            self.display_cpu_mode()
+        elif self.display_mode == "gpu":
+            self.display_gpu_mode()
+        elif self.display_mode == "alternating":
+            self.display_alternating(metrics_updated)
+        elif self.display_mode == "debug_ui":
+            # Only the displayed section is rendered, the metrics one in the debug UI
+            if self.config:
+                self.colors = self.get_config_colors(self.config, key="metrics")
+            else:
+                self.colors = self.metrics_colors
+            self.leds = self.full_leds
+        else:
+            print(f"Unknown display mode: {self.display_mode}")
+
+        rendered = time.monotonic()
+        self.send_packets()
+        self.render_time.observe(rendered - started)
+        self.stages.add("send", time.monotonic() - rendered)
+        self.stages.end_frame()
+        return True
+
     def display(self):
+        self.scheduler.reset()
         while True:
-            self.config = self.load_config()
-            metrics_updated = self.update()
-            if self.dev is None:
-                # Try to re-open the HID device
-                self.dev = self.get_device()
-                time.sleep(1)
+            self.scheduler.begin_frame()
+            drawn = self.render_frame()
+            self.scheduler.set_interval(self.frame_interval)
+            self.export_stats()
+            if not drawn:
+                # Wait for the device to be plugged in or the next retry, still checking the config every second
+                self.devices.wait(1.0)
+                self.scheduler.reset()
                 continue
+            # Sleep until the next frame deadline, dropping frames if this one overran
+            self.scheduler.end_frame(self.frame_wake())
+
+    def frame_wake(self):
+        """
+        When frames only change with the metrics, wake on each published snapshot instead of a timer
+        of the same period, which would show each sample up to one interval late.
+        """
+        if self.frame_interval_reason != "metrics":
+            return None
+        # The deadline is only a fallback for a stalled sampler; half an interval of slack so that
+        # sampling jitter doesn't fire it just before the snapshot and render the old one again
+        return lambda timeout: self.metrics.wait_for_snapshot(self, timeout + self.frame_interval / 2)
+
+
+class ControllerGroup:
+    """
+    Several displays driven from one process and one render loop: a Controller per device, all sharing
+    the config watcher, the metrics sampler and the color compiler, so the sensors are read once
+    whatever the number of displays. Each display keeps its own HID writer thread.
+    """
+    def __init__(self, entries, config_path=None, config_watcher=None):
+        self.config_path = resolve_config_path(config_path)
+        self.config_watcher = config_watcher or ConfigWatcher(self.config_path)
+        self.metrics = Metrics()
+        self.color_compiler = ColorCompiler()
+        self.controllers = [
+            Controller(self.config_path, device=entry, metrics=self.metrics,
+                       color_compiler=self.color_compiler, config_watcher=self.config_watcher)
+            for entry in entries
+        ]
+        self.scheduler = FrameScheduler(self.frame_interval())
+
+    def frame_interval(self):
+        return min(controller.frame_interval for controller in self.controllers)
+
+    def get_stats(self):
+        devices = [controller.get_stats() for controller in self.controllers]
+        for stats in devices:
+            # Shared by every display, reported once
+            del stats["metrics"]
+        return {
+            "scheduler": self.scheduler.get_stats(),
+            "metrics": self.metrics.get_stats(),
+            "devices": devices,
+        }
+
+    def export_stats(self):
+        def collect(text):
+            for controller in self.controllers:
+                controller.collect_stats(text)
+            self.metrics.collect_stats(text)
+            self.scheduler.collect_stats(text)
+        # Every display reads the same config, the first one's textfile settings apply to the group
+        self.controllers[0].exporter.maybe_write(collect)
 
-            # existing display logic...
-            if self.display_mode == "cpu":
-                self.display_cpu_mode()
-            elif self.display_mode == "gpu":
-                self.display_gpu_mode()
-            elif self.display_mode == "alternating":
-                self.display_alternating(metrics_updated)
-            elif self.display_mode == "debug_ui":
-                self.colors = self.metrics_colors
-                self.leds[:] = 1
-            else:
-                print(f"Unknown display mode: {self.display_mode}")
-
-            self.send_packets()
-            time.sleep(self.update_interval)
+    def display(self):
+        self.scheduler.reset()
+        while True:
+            self.scheduler.begin_frame()
+            drawn = [controller.render_frame() for controller in self.controllers]
+            self.scheduler.set_interval(self.frame_interval())
+            self.export_stats()
+            if not any(drawn):
+                # No display plugged in: wait for a hotplug event or the next retry
+                self.controllers[0].devices.wait(1.0)
+                self.scheduler.reset()
+                continue
+            wakes = [controller.frame_wake() for controller in self.controllers]
+            # Displays share the snapshots, any of them can wait when they all follow the metrics
+            self.scheduler.end_frame(wakes[0] if all(wakes) else None)
+
+
+def find_devices(config):
+    """
+    The "devices" entries of config, or one entry per connected display matching vendor_id/product_id
+    (by path) when several are plugged in, or a single entry for the first matching display.
+    """
+    if config and config.get("devices"):
+        return config["devices"]
+    config = config or {}
+    try:
+        found = hid.enumerate(int(config.get('vendor_id', "0x0416"), 16), int(config.get('product_id', "0x8001"), 16))
+    except Exception as e:
+        print(f"Error enumerating HID devices: {e}")
+        found = []
+    if len(found) > 1:
+        return [{"path": info['path'].decode()} for info in found]
+    return [{}]
 
 
 def main(config_path):
-    controller = Controller(config_path=config_path)
+    config_watcher = ConfigWatcher(resolve_config_path(config_path))
+    entries = find_devices(config_watcher.config)
+    if len(entries) == 1:
+        controller = Controller(config_path=config_path, device=entries[0], config_watcher=config_watcher)
+    else:
+        print(f"Driving {len(entries)} displays.")
+        controller = ControllerGroup(entries, config_path=config_path, config_watcher=config_watcher)
+    # kill -USR1 <pid> prints the counters and timing histograms
+    signal.signal(signal.SIGUSR1, lambda signum, frame: print(json.dumps(controller.get_stats(), indent=2), flush=True))
     controller.display()
 
 if __name__ == '__main__':
@@ -0,0 +1,306 @@
+import os
+import select
+import socket
+import threading
+import time
+import numpy as np
+from config import NUMBER_OF_LEDS
+from stats import Histogram
+
+NETLINK_KOBJECT_UEVENT = 15
+UEVENT_KERNEL_GROUP = 1
+
+HEADER = bytes.fromhex('dadbdcdd000000000000000000000000fc0000ff')
+PACKET_SIZE = 64
+
+
+class PacketEncoder:
+    """
+    Encodes a frame into the HID reports expected by the display, in a buffer allocated once.
+    The first report is HEADER followed by the start of the RGB payload; the following ones are a
+    0x00 report ID followed by up to PACKET_SIZE payload bytes.
+    """
+    def __init__(self, header=HEADER, number_of_leds=NUMBER_OF_LEDS, packet_size=PACKET_SIZE):
+        payload_size = number_of_leds * 3
+        chunks = [(0, packet_size - len(header))]
+        while chunks[-1][1] < payload_size:
+            start = chunks[-1][1]
+            chunks.append((start, min(start + packet_size, payload_size)))
+
+        self.buffer = bytearray(len(header) + payload_size + len(chunks) - 1)
+        self.buffer[:len(header)] = header
+        # offsets[k] is the position of the k-th payload byte in self.buffer
+        self.offsets = np.empty(payload_size, dtype=np.intp)
+        views = []
+        position = 0
+        buffer_view = memoryview(self.buffer)
+        for i, (start, end) in enumerate(chunks):
+            packet_start = position
+            if i == 0:
+                position += len(header)
+            else:
+                self.buffer[position] = 0  # report ID
+                position += 1
+            self.offsets[start:end] = np.arange(position, position + end - start)
+            position += end - start
+            views.append(buffer_view[packet_start:position])
+        self.packets = views
+        self.array = np.frombuffer(self.buffer, dtype=np.uint8)
+        self.masked = np.zeros((number_of_leds, 3), dtype=np.uint8)
+
+    def encode(self, colors, leds):
+        """Write colors (N, 3) masked by leds (N,) into the buffer, return the packets as memoryviews"""
+        np.multiply(colors, (leds != 0)[:, None], out=self.masked, casting='unsafe')
+        self.array[self.offsets] = self.masked.reshape(-1)
+        return self.packets
+
+
+class HidWriter:
+    """
+    Writes frames to the device from its own thread, so a stalled or re-enumerating USB device never
+    blocks rendering and sampling. The mailbox holds a single frame: a frame submitted while the
+    previous one is still waiting replaces it (latest frame wins) instead of being queued.
+    A device whose write raised is kept in `failed` until the caller replaces it. Devices are closed
+    with retire(), on this thread between two writes, so a close never overlaps a write on the handle.
+    """
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.condition = threading.Condition()
+        self.pending = None
+        self.retired = []
+        self.failed = None
+        self.frames_written = 0
+        self.frames_dropped = 0
+        self.errors = 0
+        self.last_error = None
+        self.latency = Histogram()
+        self.running = True
+        self.thread = threading.Thread(target=self.writer_loop, name="hid-writer", daemon=True)
+        self.thread.start()
+
+    def submit(self, dev, packets):
+        """Hand a frame over to the writer thread; packets are copied, the encoder buffer can be reused right away"""
+        # Copied to bytes: hid.Device.write hands data to a ctypes c_char_p, which only accepts bytes
+        frame = (dev, [bytes(packet) for packet in packets])
+        with self.condition:
+            if self.pending is not None:
+                self.frames_dropped += 1
+            self.pending = frame
+            self.condition.notify()
+
+    def retire(self, dev):
+        """Close dev once any write in progress on it returns; its pending frame is dropped"""
+        with self.condition:
+            if self.pending is not None and self.pending[0] is dev:
+                self.pending = None
+            if self.running or self.thread.is_alive():
+                self.retired.append(dev)
+                self.condition.notify()
+                return
+        # Writer thread is gone, nothing can be writing
+        self.close_device(dev)
+
+    @staticmethod
+    def close_device(dev):
+        try:
+            dev.close()
+        except Exception:
+            pass
+
+    def writer_loop(self):
+        while True:
+            with self.condition:
+                while self.pending is None and not self.retired and self.running:
+                    self.condition.wait()
+                retired, self.retired = self.retired, []
+                frame, self.pending = self.pending, None
+                running = self.running
+            for dev in retired:
+                self.close_device(dev)
+                if dev is self.failed:
+                    self.failed = None
+            if not running:
+                return
+            if frame is None:
+                continue
+            dev, packets = frame
+            if dev is self.failed or any(dev is closed for closed in retired):
+                continue
+            started = self.clock()
+            try:
+                for packet in packets:
+                    dev.write(packet)
+            except Exception as e:
+                self.errors += 1
+                self.last_error = repr(e)
+                self.failed = dev
+                print(f"Error writing to HID device: {e}")
+                continue
+            self.latency.observe(self.clock() - started)
+            self.frames_written += 1
+
+    def close(self, timeout=1.0):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.thread.join(timeout)
+
+    def get_stats(self):
+        return {
+            "frames_written": self.frames_written,
+            "frames_dropped": self.frames_dropped,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "write_latency": self.latency.summary(),
+        }
+
+
+class UeventSource:
+    """
+    Kernel uevents for hidraw devices, read from the netlink socket udev itself listens to.
+    read() returns the pending (action, devname) pairs without blocking, devname being the node
+    under /dev (e.g. 'hidraw3'); wait(timeout) blocks until
+    an event arrives or timeout elapses. Raises OSError where netlink isn't available (e.g. containers).
+    """
+    def __init__(self, subsystem="hidraw"):
+        self.subsystem = subsystem
+        self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_KOBJECT_UEVENT)
+        try:
+            self.sock.bind((0, UEVENT_KERNEL_GROUP))
+            self.sock.setblocking(False)
+        except OSError:
+            self.sock.close()
+            raise
+
+    @staticmethod
+    def parse(data):
+        """'add@/devices/...\\0ACTION=add\\0SUBSYSTEM=hidraw\\0...' to a dict of its KEY=value fields"""
+        fields = {}
+        for field in data.split(b'\0')[1:]:
+            key, _, value = field.partition(b'=')
+            if value:
+                fields[key.decode(errors='replace')] = value.decode(errors='replace')
+        return fields
+
+    def read(self):
+        events = []
+        while True:
+            try:
+                data = self.sock.recv(8192)
+            except BlockingIOError:
+                return events
+            fields = self.parse(data)
+            if fields.get("SUBSYSTEM") == self.subsystem:
+                events.append((fields.get("ACTION"), fields.get("DEVNAME")))
+
+    def wait(self, timeout):
+        select.select([self.sock], [], [], max(0.0, timeout))
+
+    def close(self):
+        self.sock.close()
+
+
+class DeviceManager:
+    """
+    Keeps the display's HID device open across unplugs and write errors.
+    open_device() must return (device, path) or raise; path is the device node (e.g. b'/dev/hidraw3'),
+    None if unknown. Failed opens are retried with exponential backoff between min_backoff and
+    max_backoff seconds; a hidraw add uevent triggers an immediate retry, the remove of our node a
+    clean close, so nothing is reopened in a loop while the device is unplugged. Other removes, or any
+    remove when the path is unknown, are left to the write errors. Without uevents, opens are retried
+    every poll_interval seconds at most. close_device(dev) closes a handle, pass HidWriter.retire
+    so the close happens on the writer thread.
+    """
+    def __init__(self, open_device, events=None, min_backoff=0.5, max_backoff=60.0, poll_interval=5.0, clock=time.monotonic,
+                 close_device=HidWriter.close_device):
+        self.open_device = open_device
+        self.close_handle = close_device
+        self.min_backoff = min_backoff
+        self.clock = clock
+        if events is None:
+            try:
+                events = UeventSource()
+            except Exception as e:
+                print(f"udev events not available, polling for the HID device: {e}")
+        self.events = events
+        self.max_backoff = max_backoff if events is not None else min(max_backoff, poll_interval)
+        self.dev = None
+        self.path = None
+        self.backoff = 0
+        self.next_attempt = 0
+        self.failures = 0
+        self.opens = 0
+
+    def get(self):
+        """The open device, or None if it isn't available yet; never blocks"""
+        if self.events is not None:
+            for action, devname in self.events.read():
+                if action == "add" and self.dev is None:
+                    # Kernel uevents come before udev applies the permissions rule, so the first open
+                    # may fail with EACCES: retry soon instead of after the backoff built while unplugged
+                    self.next_attempt = 0
+                    self.backoff = 0
+                elif action == "remove" and self.dev is not None and self.is_ours(devname):
+                    self.close_device()
+                    self.next_attempt = 0
+        if self.dev is None and self.clock() >= self.next_attempt:
+            self.try_open()
+        return self.dev
+
+    def is_ours(self, devname):
+        if self.path is None or not devname:
+            return False
+        return os.path.basename(os.fsdecode(self.path)) == os.path.basename(devname)
+
+    def try_open(self):
+        try:
+            self.dev, self.path = self.open_device()
+        except Exception as e:
+            if self.failures == 0:
+                print(f"Error initializing HID device, waiting for it: {e}")
+            self.failures += 1
+            self.backoff = min(self.max_backoff, max(self.min_backoff, self.backoff * 2))
+            self.next_attempt = self.clock() + self.backoff
+            return
+        if self.failures:
+            print(f"HID device opened after {self.failures} failed attempts.")
+        self.failures = 0
+        self.backoff = 0
+        self.opens += 1
+
+    def wait(self, timeout):
+        """Sleep until the next open attempt or a uevent, at most timeout seconds"""
+        timeout = min(timeout, max(0.0, self.next_attempt - self.clock()))
+        if self.events is not None:
+            self.events.wait(timeout)
+        else:
+            time.sleep(timeout)
+
+    def close_device(self):
+        if self.dev is not None:
+            self.close_handle(self.dev)
+            self.dev = None
+            self.path = None
+
+    def lost(self, dev):
+        """Called when a write on dev failed: close it and reopen after the minimum backoff"""
+        if dev is self.dev:
+            self.close_device()
+            self.backoff = self.min_backoff
+            self.next_attempt = self.clock() + self.backoff
+
+    def reopen(self):
+        """Close the device and open it again right away, e.g. after the vendor/product id changed"""
+        self.close_device()
+        self.backoff = 0
+        self.failures = 0
+        self.next_attempt = 0
+        return self.get()
+
+    def close(self):
+        self.close_device()
+        if self.events is not None:
+            self.events.close()
+
+    def get_stats(self):
+        return {"open": self.dev is not None, "opens": self.opens, "failures": self.failures, "backoff": self.backoff}
@@ -7,6 +7,7 @@ import numpy as np
 import threading
 import time
 from utils import interpolate_color, get_random_color
+from colors import ColorContext, parse_color_spec, split_options, frame_to_hex
 
 segmented_digit_layout = {# Position segments in a 7-segment layout
     "top_left":
@@ -46,6 +47,8 @@ class LEDDisplayUI:
         self.update_interval = self.config["update_interval"]
         self.cycle_duration = self.config["cycle_duration"]
         self.start_time = time.time()
+        self.animated_specs = {}
+        self.animated_frame = np.zeros((NUMBER_OF_LEDS, 3), dtype=np.uint8)
         threading.Thread(target=self.update_ui_loop, daemon=True).start()
 
         # Reset button
@@ -98,79 +101,26 @@ class LEDDisplayUI:
                     color = color_str
                     if color.lower() == "random":
                         color = get_random_color()
-                    elif color.startswith("wave_"):
-                        wave_type, gradient = color.split(";", 1)
-                        colors_list = gradient.split('-')
-                        num_colors = len(colors_list)
-
-                        if num_colors >= 2:
-                            if colors_list[0] != colors_list[-1]:
-                                colors_list.append(colors_list[0])
-                            
-                            num_segments = len(colors_list) - 1
-                            total_duration = self.cycle_duration
-                            
-                            if wave_type == "wave_ltr":
-                                phase_shift = (index / self.number_of_leds) * total_duration
-                            else: # wave_rtl
-                                phase_shift = ((self.number_of_leds - index) / self.number_of_leds) * total_duration
-                            
-                            time_in_cycle = ((current_time - self.start_time) + phase_shift) % total_duration
-                            
-                            if num_segments > 0:
-                                segment_duration = total_duration / num_segments
-                                segment_index = min(int(time_in_cycle / segment_duration), num_segments - 1)
-                                
-                                start_color = colors_list[segment_index]
-                                end_color = colors_list[segment_index + 1]
-                                
-                                time_in_segment = time_in_cycle - (segment_index * segment_duration)
-                                if segment_duration > 0:
-                                    factor = time_in_segment / segment_duration
-                                else:
-                                    factor = 0
-                                color = interpolate_color(start_color=start_color, end_color=end_color, factor=factor)
-                            else:
-                                color = colors_list[0]
-                        else:
-                            color = colors_list[0]
+                    elif color.startswith("wave_") or ("-" in color and len(split_options(color)[0].split("-")) != 3):
+                        # Waves and cycling gradients are previewed with the controller's color engine
+                        color = self.animated_color(color, index, current_time - self.start_time)
                     elif "-" in color:
-                        split_color = color.split("-")
-                        if len(split_color) == 3:
-                            start_color, end_color, metric = split_color
-                            factor=elapsed_time/(self.cycle_duration*2)
-                            color = interpolate_color(start_color=start_color, end_color=end_color, factor=factor)
-                        else:
-                            colors_list = split_color
-                            num_colors = len(colors_list)
-                            
-                            if num_colors >= 2:
-                                # Add first color to the end to make a loop
-                                if colors_list[0] != colors_list[-1]:
-                                    colors_list.append(colors_list[0])
-                                
-                                num_segments = len(colors_list) - 1
-                                total_duration = self.cycle_duration
-                                time_in_cycle = (current_time - self.start_time) % total_duration
-                                
-                                segment_duration = total_duration / num_segments
-                                segment_index = min(int(time_in_cycle / segment_duration), num_segments - 1)
-                                
-                                start_color = colors_list[segment_index]
-                                end_color = colors_list[segment_index + 1]
-                                
-                                time_in_segment = time_in_cycle - (segment_index * segment_duration)
-                                factor = time_in_segment / segment_duration
-                                
-                                color = interpolate_color(start_color=start_color, end_color=end_color, factor=factor)
-                            else:
-                                color = colors_list[0]
+                        start_color, end_color, metric = color.split("-")
+                        factor=elapsed_time/(self.cycle_duration*2)
+                        color = interpolate_color(start_color=start_color, end_color=end_color, factor=factor)
 
                     self.set_ui_color(index, color="#"+color)
             except Exception as e:
                 print(f"Error in update_ui_loop: {e}")
             time.sleep(self.update_interval)
 
+    def animated_color(self, color, index, elapsed):
+        if color not in self.animated_specs:
+            self.animated_specs[color] = parse_color_spec(color)
+        ctx = ColorContext(None, elapsed, self.cycle_duration, None, None, None, self.update_interval)
+        self.animated_specs[color].render(self.animated_frame, np.array([index]), ctx)
+        return frame_to_hex(self.animated_frame[index:index+1])[0]
+
     def load_config(self):
         try:
             with open(self.config_path, 'r') as f:
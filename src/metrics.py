@@ -1,26 +1,393 @@
+import atexit
+import glob
+import hashlib
+import importlib.util
+import shutil
 import subprocess
 import re
-import psutil
+import numpy as np
 import time
 import os
 import json
+import numbers
+import threading
+from collections import namedtuple
+from types import MappingProxyType
+from stats import Histogram
 
-try:
-    import pyamdgpuinfo
-except Exception as e:
-    print("pyamdgpuinfo cannot start : ",str(e))
+# Immutable set of metric values published by Metrics.sample()
+# stale holds the metrics whose source missed its deadline, their values are the last good ones
+MetricsSnapshot = namedtuple('MetricsSnapshot', ['seq', 'timestamp', 'values', 'stale'])
 
+# Bump when the collectors or their names change, so cached probe results are discarded
+PROBE_CACHE_VERSION = 2
+# Third-party backends: callables taking the Metrics instance and returning a backend, see BackendRegistry
+ENTRY_POINT_GROUP = 'digital_lcd.backends'
+# Reads per backend and metric when probing; the median latency is the backend's cost
+PROBE_SAMPLES = 3
+# Seconds a backend read may take before its values are marked stale, unless the backend sets `deadline`
+DEFAULT_DEADLINE = 0.5
+# Consecutive missed deadlines before a backend is quarantined, and the quarantine backoff bounds in seconds
+QUARANTINE_AFTER = 3
+QUARANTINE_MIN_BACKOFF = 5.0
+QUARANTINE_MAX_BACKOFF = 300.0
+# Python bindings some backends need; whether they are installed is part of the hardware fingerprint
+VENDOR_MODULES = ('pynvml', 'pyamdgpuinfo')
+# Values outside these ranges mean the source is broken (e.g. a sensor stuck at 0)
+PLAUSIBLE_RANGES = {
+    'cpu_temp': (1, 150), 'gpu_temp': (1, 150), 'cpu_temp_max': (1, 150),
+    'cpu_usage': (0, 100), 'gpu_usage': (0, 100), 'cpu_usage_max': (0, 100),
+    'cpu_speed': (1, 20000), 'gpu_speed': (1, 20000),
+}
+
+
+def probe_cache_path():
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'digital_lcd', 'probe.json')
+
+
+def read_first_line(path):
+    try:
+        with open(path, 'r') as f:
+            return f.readline().strip()
+    except OSError:
+        return ""
+
+
+def hardware_fingerprint(gpu_vendor, backend_names=()):
+    """
+    Hash of what decides which collectors work on this host: kernel, CPU model, hwmon sensors,
+    GPU driver versions, the vendor tools on PATH and the installed vendor Python bindings. Cheap
+    reads only, no process is spawned and no binding imported.
+    """
+    cpu_model = ""
+    try:
+        with open('/proc/cpuinfo', 'r') as f:
+            cpu_model = next((line.split(':', 1)[1].strip() for line in f if line.startswith(('model name', 'Model'))), "")
+    except OSError:
+        pass
+    parts = [
+        str(PROBE_CACHE_VERSION), gpu_vendor, os.uname().release, os.uname().machine, cpu_model,
+        ",".join(sorted(read_first_line(path) for path in glob.glob('/sys/class/hwmon/hwmon*/name'))),
+        read_first_line('/sys/module/nvidia/version'),
+        str(os.path.isdir('/sys/module/amdgpu')),
+        str(os.path.exists('/sys/devices/system/cpu/cpu0/cpufreq/scaling_cur_freq')),
+        str(shutil.which('nvidia-smi')), str(shutil.which('vcgencmd')),
+        # Installing a vendor binding makes a cheaper backend available, e.g. pynvml over nvidia-smi
+        ",".join(f"{module}={vendor_module_available(module)}" for module in VENDOR_MODULES),
+        ",".join(backend_names),
+    ]
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+
+def vendor_module_available(module):
+    """Whether a vendor binding can be imported, without importing it"""
+    try:
+        return importlib.util.find_spec(module) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def load_probe_cache(path, fingerprint):
+    """The collector picked for each metric on a previous start of this host, or {} if unknown"""
+    try:
+        with open(path, 'r') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict) or cache.get('fingerprint') != fingerprint or not isinstance(cache.get('collectors'), dict):
+        return {}
+    return cache['collectors']
+
+
+def save_probe_cache(path, fingerprint, collectors):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'fingerprint': fingerprint, 'collectors': collectors}, f, indent=2)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Could not save probe cache to {path}: {e}")
+
+
+def call_with_deadline(function, timeout):
+    """
+    Run function on a daemon thread and wait at most timeout seconds.
+    Returns (finished, value, exception); a call that didn't finish keeps running in the background.
+    """
+    outcome = {}
+
+    def run():
+        try:
+            outcome['value'] = function()
+        except Exception as e:
+            outcome['error'] = e
+    thread = threading.Thread(target=run, name="metrics-probe", daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        return False, None, None
+    return True, outcome.get('value'), outcome.get('error')
+
+
+def collector(backend, metric):
+    """The function reading metric from backend; provides values are method names or plain functions"""
+    getter = backend.provides[metric]
+    return getattr(backend, getter) if isinstance(getter, str) else getter
+
+
+def open_amd_gpu():
+    """First GPU seen by pyamdgpuinfo, imported here so hosts without an AMD GPU never load it; None if unavailable"""
+    try:
+        import pyamdgpuinfo
+    except Exception as e:
+        print("pyamdgpuinfo cannot start : ",str(e))
+        print("pyamdgpuinfo not installed. GPU temperature will not be available.")
+        return None
+    try:
+        if pyamdgpuinfo.detect_gpus() > 0:
+            return pyamdgpuinfo.get_gpu(0)
+    except Exception as e:
+        print(f"pyamdgpuinfo failed: {e}")
+        return None
+    print(f"No AMD GPU detected.")
+    return None
+
+
+class FunctionBackend:
+    """Stateless collector functions grouped under one backend name"""
+    def __init__(self, name, provides):
+        self.name = name
+        self.provides = provides
+
+
+def builtin_backends(metrics):
+    """The bundled backends usable for metrics.gpu_vendor, fastest expected first (ties go to the earlier one)"""
+    backends = [SysfsBackend(), ProcStatBackend()]
+    if metrics.gpu_vendor == 'nvidia':
+        backends += [NvmlBackend(), NvidiaSmiBackend(stream_ms=int(metrics.metrics_update_interval * 1000))]
+    elif metrics.gpu_vendor == 'amd':
+        backends.append(AmdGpuBackend())
+    backends += [
+        FunctionBackend("thermal_zone", {'cpu_temp': get_cpu_temp_linux}),
+        FunctionBackend("psutil", {'cpu_temp': get_cpu_temp_psutils, 'cpu_usage': get_cpu_usage, 'cpu_speed': get_cpu_speed_psutil}),
+        FunctionBackend("cpuinfo", {'cpu_speed': get_cpu_speed_proc}),
+        FunctionBackend("vcgencmd", {'cpu_temp': get_cpu_temp_raspberry_pi}),
+    ]
+    return backends
+
+
+def entry_point_backends(metrics):
+    """Backends installed by other packages under the digital_lcd.backends entry point group"""
+    try:
+        from importlib.metadata import entry_points
+        points = entry_points()
+        points = points.select(group=ENTRY_POINT_GROUP) if hasattr(points, 'select') else points.get(ENTRY_POINT_GROUP, [])
+    except Exception as e:
+        print(f"Could not list {ENTRY_POINT_GROUP} entry points: {e}")
+        return []
+    backends = []
+    for point in points:
+        try:
+            backend = point.load()(metrics)
+            if not isinstance(backend.name, str) or not isinstance(backend.provides, dict):
+                raise TypeError("a backend needs a name and a provides dict")
+            backends.append(backend)
+        except Exception as e:
+            print(f"Could not load backend {point.name}: {e}")
+    return backends
+
+
+class BackendRegistry:
+    """
+    Picks the source of each metric among backends declaring what they provide.
+    A backend has a `name`, a `provides` dict mapping metric names to a method name or a function,
+    and optionally invalidate() (one shared read per sample), activate() (called once picked) and
+    close() (called when nothing picked it). Each working backend is timed over PROBE_SAMPLES reads
+    and the cheapest one returning plausible values wins; a backend already picked for another metric
+    and reading them all at once costs nothing more.
+    """
+    def __init__(self, backends):
+        self.backends = backends
+
+    def names(self):
+        return [backend.name for backend in self.backends]
+
+    def find(self, name, metric):
+        return next((backend for backend in self.backends if backend.name == name and metric in backend.provides), None)
+
+    @staticmethod
+    def measure(backend, metric, samples=PROBE_SAMPLES):
+        """(median latency in seconds, last value) of reading metric from backend, None if it doesn't work"""
+        low, high = PLAUSIBLE_RANGES.get(metric, (float('-inf'), float('inf')))
+        function = collector(backend, metric)
+        deadline = getattr(backend, 'deadline', DEFAULT_DEADLINE)
+        latencies = []
+        value = None
+        for _ in range(samples):
+            if hasattr(backend, 'invalidate'):
+                backend.invalidate()
+            started = time.perf_counter()
+            finished, value, error = call_with_deadline(function, deadline)
+            if not finished:
+                print(f"{metric}: {backend.name} missed its {deadline}s deadline while probing, not using it")
+                return None
+            if error is not None:
+                return None
+            latencies.append(time.perf_counter() - started)
+            # Third-party backends may return anything: strings, None, NaN
+            if isinstance(value, bool) or not isinstance(value, numbers.Real) or not low <= value <= high:
+                return None
+        return sorted(latencies)[len(latencies) // 2], value
+
+    def select(self, metrics, cached=None):
+        """{metric: (backend, first value)}, backend None when nothing works; cached maps metrics to backend names"""
+        cached = cached or {}
+        picks = {}
+        candidates = {}
+        for metric in metrics:
+            # Metrics nothing provided last time are probed again, the driver may not have been ready
+            if cached.get(metric) is not None:
+                backend = self.find(cached[metric], metric)
+                result = self.measure(backend, metric, samples=1) if backend is not None else None
+                if result is not None:
+                    picks[metric] = (backend, result[1])
+                    continue
+            candidates[metric] = []
+            for order, backend in enumerate(self.backends):
+                if metric in backend.provides:
+                    result = self.measure(backend, metric)
+                    if result is not None:
+                        candidates[metric].append((result[0], order, backend, result[1]))
+        chosen = {backend for backend, _ in picks.values() if backend is not None}
+        # Metrics with fewer working sources first, so shared backends they force are free for the others
+        for metric in sorted(candidates, key=lambda metric: len(candidates[metric])):
+            working = candidates[metric]
+            if not working:
+                picks[metric] = (None, None)
+                continue
+            cost = lambda entry: (0.0 if entry[2] in chosen and hasattr(entry[2], 'invalidate') else entry[0], entry[1])
+            latency, _, backend, value = min(working, key=cost)
+            chosen.add(backend)
+            picks[metric] = (backend, value)
+            others = ", ".join(f"{entry[2].name} {entry[0] * 1000:.2f} ms" for entry in working if entry[2] is not backend)
+            print(f"{metric}: using {backend.name} ({latency * 1000:.2f} ms per read)" + (f", also working: {others}" if others else ""))
+        return {metric: picks[metric] for metric in metrics}
+
+    def activate(self, picks):
+        """Activate the picked backends and close the others, return the picked ones"""
+        picked = []
+        for backend, _ in picks.values():
+            if backend is not None and backend not in picked:
+                picked.append(backend)
+        for backend in self.backends:
+            if backend in picked:
+                if hasattr(backend, 'activate'):
+                    backend.activate()
+            elif hasattr(backend, 'close'):
+                backend.close()
+        return picked
+
+
+class BackendWorker:
+    """
+    Reads the picked metrics of one backend on its own daemon thread, so a hung driver call or child
+    process only stalls that backend. sample() waits for each read until its deadline; a read still
+    running then leaves its metrics stale (last good value kept) and the next sample doesn't queue
+    another one behind it. A read raising TimeoutError (the backend noticed its source hung) counts
+    as a miss too. After QUARANTINE_AFTER consecutive misses the backend is skipped for an
+    exponentially growing backoff, then retried.
+    """
+    def __init__(self, backend, functions, clock=time.monotonic):
+        self.backend = backend
+        self.name = backend.name
+        self.functions = functions
+        self.deadline = getattr(backend, 'deadline', DEFAULT_DEADLINE)
+        self.clock = clock
+        self.misses = 0
+        self.timeouts = 0
+        self.backoff = 0
+        self.quarantined_until = 0
+        self.result = None
+        self.request = threading.Event()
+        self.done = threading.Event()
+        self.done.set()
+        self.thread = threading.Thread(target=self.worker_loop, name=f"metrics-{self.name}", daemon=True)
+        self.thread.start()
+
+    def worker_loop(self):
+        while True:
+            self.request.wait()
+            self.request.clear()
+            self.result = self.read()
+            self.done.set()
+
+    def read(self):
+        """Runs on the worker thread: {metric: (value or exception, seconds)}"""
+        if hasattr(self.backend, 'invalidate'):
+            self.backend.invalidate()
+        result = {}
+        for metric, function in self.functions.items():
+            started = time.perf_counter()
+            try:
+                value = function()
+            except Exception as e:
+                value = e
+            result[metric] = (value, time.perf_counter() - started)
+        return result
+
+    def quarantined(self):
+        return self.clock() < self.quarantined_until
+
+    def start(self):
+        """Ask for a read; False if quarantined or the previous read hasn't returned yet"""
+        if self.quarantined() or not self.done.is_set():
+            return False
+        self.done.clear()
+        self.request.set()
+        return True
+
+    def wait(self, started, timeout):
+        """The read's result, or None once timeout seconds after started passed without one"""
+        if started and self.done.wait(max(0.0, timeout)) and not self.timed_out(self.result):
+            if self.misses >= QUARANTINE_AFTER:
+                print(f"Metrics backend {self.name} responds again.")
+            self.misses = 0
+            self.backoff = 0
+            return self.result
+        if started or not self.quarantined():
+            self.miss()
+        return None
+
+    @staticmethod
+    def timed_out(result):
+        return any(isinstance(value, TimeoutError) for value, _ in result.values())
+
+    def miss(self):
+        self.misses += 1
+        self.timeouts += 1
+        if self.misses >= QUARANTINE_AFTER:
+            self.backoff = min(QUARANTINE_MAX_BACKOFF, max(QUARANTINE_MIN_BACKOFF, self.backoff * 2))
+            self.quarantined_until = self.clock() + self.backoff
+            print(f"Metrics backend {self.name} timed out or missed its {self.deadline}s deadline {self.misses} times in a row, "
+                  f"quarantined for {self.backoff}s; its values are kept but marked stale.")
+
+    def get_stats(self):
+        return {"deadline": self.deadline, "timeouts": self.timeouts, "quarantined": self.quarantined(), "backoff": self.backoff}
 
 
 class Metrics:
-    def __init__(self, update_interval=0.5):
+    def __init__(self, update_interval=0.5, probe_cache=None):
         self.metrics_functions = {
             'cpu_temp': None,
             'gpu_temp': None,
             'cpu_usage': None,
             'gpu_usage': None,
             'cpu_speed': None,
-            'gpu_speed': None
+            'gpu_speed': None,
+            'cpu_usage_max': None,
+            'cpu_temp_max': None,
         }
         self.metrics = {
             'cpu_temp': 0,
@@ -29,102 +396,210 @@ class Metrics:
             'gpu_usage': 0,
             'cpu_speed': 0,
             'gpu_speed': 0,
+            'cpu_usage_max': 0,  # busiest core
+            'cpu_temp_max': 0,  # hottest sensor of the CPU
         }
         config_path = os.environ.get('DIGITAL_LCD_CONFIG', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config.json'))
         try:
             with open(config_path, 'r') as f:
                 config = json.load(f)
                 self.gpu_vendor = config.get('gpu_vendor', 'nvidia')
+                self.metrics_update_interval = config.get('metrics_update_interval', update_interval)
         except Exception as e:
             print(f"Could not load config to get gpu_vendor, defaulting to nvidia: {e}")
             self.gpu_vendor = 'nvidia'
+            self.metrics_update_interval = update_interval
 
-        try:
-            device_count = pyamdgpuinfo.detect_gpus()
-            if device_count > 0:
-                self.gpu = pyamdgpuinfo.get_gpu(0)
-            else:
-                print(f"No AMD GPU detected.")
-                self.gpu = -1
-        except:
-            print("pyamdgpuinfo not installed. GPU temperature will not be available.")
-            self.gpu = None
-
-        candidates =  {
-            'cpu_temp': [get_cpu_temp_psutils, get_cpu_temp_linux, get_cpu_temp_raspberry_pi],
-            'gpu_temp': [],
-            'cpu_usage': [get_cpu_usage],
-            'gpu_usage': [],
-            'cpu_speed': [get_cpu_speed_psutil, get_cpu_speed_proc],
-            'gpu_speed': []
-        }
+        self.metrics_sources = dict.fromkeys(self.metrics_functions)
+        self.registry = BackendRegistry(builtin_backends(self) + entry_point_backends(self))
+        # Warm starts only check the backend picked last time on the same hardware instead of probing
+        # (and spawning) every candidate
+        self.probe_cache = probe_cache or probe_cache_path()
+        fingerprint = hardware_fingerprint(self.gpu_vendor, self.registry.names())
+        cached = load_probe_cache(self.probe_cache, fingerprint)
+        picks = self.registry.select(list(self.metrics_functions), cached)
+        for metric, (backend, value) in picks.items():
+            if backend is None:
+                print(f"Warning: No suitable function found for {metric}.")
+                continue
+            self.metrics[metric] = int(value)
+            self.metrics_functions[metric] = collector(backend, metric)
+            self.metrics_sources[metric] = backend.name
+        # One worker per picked backend, each read once per sample under the backend's deadline
+        self.workers = [
+            BackendWorker(backend, {metric: function for metric, function in self.metrics_functions.items()
+                                    if self.metrics_sources[metric] == backend.name})
+            for backend in self.registry.activate(picks)
+        ]
+        # Only working sources are saved: a metric missing at boot (driver still loading) is probed again next start
+        found = {metric: source for metric, source in self.metrics_sources.items() if source is not None}
+        if found != cached:
+            save_probe_cache(self.probe_cache, fingerprint, found)
+        self.last_update = time.time()
+        self.update_interval = update_interval # seconds
+        self.snapshot = MetricsSnapshot(0, time.monotonic(), MappingProxyType(dict(self.metrics)), frozenset())
+        self.last_read_seq = {}  # Last snapshot seen by each reader, see get_metrics()
+        # Time of a whole sample() and of each collector; a collector reading a shared backend pays its read
+        self.sample_time = Histogram()
+        self.collector_time = {metric: Histogram() for metric in self.metrics_functions}
+        self.collector_errors = dict.fromkeys(self.metrics_functions, 0)
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.published = threading.Condition()  # Notified on each new snapshot, see wait_for_snapshot()
 
-        if self.gpu_vendor == 'nvidia':
-            candidates['gpu_temp'] = [get_gpu_temp_nvidia]
-            candidates['gpu_usage'] = [get_gpu_usage_nvml, get_gpu_usage_nvidia_smi]
-            candidates['gpu_speed'] = [get_gpu_speed_nvml, get_gpu_speed_nvidia_smi]
-        elif self.gpu_vendor == 'amd':
-            candidates['gpu_temp'] = [self.get_gpu_temp_amdgpuinfo]
-            candidates['gpu_usage'] = [self.get_gpu_usage_amd]
-            candidates['gpu_speed'] = [self.get_gpu_speed_amd]
-        for metric, functions in candidates.items():
-            for function in functions:
+    def sample(self):
+        """
+        Run every collector once and publish the result as a new snapshot. Backends read in parallel,
+        each on its worker; one missing its deadline keeps its last values, listed in snapshot.stale.
+        """
+        sample_start = time.perf_counter()
+        now = time.monotonic()
+        started = [(worker, worker.start()) for worker in self.workers]
+        stale = set()
+        for worker, was_started in started:
+            result = worker.wait(was_started, now + worker.deadline - time.monotonic())
+            if result is None:
+                stale.update(worker.functions)
+                continue
+            for metric, (value, seconds) in result.items():
+                self.collector_time[metric].observe(seconds)
+                if value is None:
+                    value = 0
                 try:
-                    result = function()
-                    if result is not None:
-                        self.metrics[metric] = int(result)
-                        self.metrics_functions[metric] = function
-                        break
+                    if isinstance(value, Exception):
+                        raise value
+                    self.metrics[metric] = int(value)
                 except Exception as e:
-                    continue
-            if self.metrics_functions[metric] is None:
-                print(f"Warning: No suitable function found for {metric}.")
+                    self.collector_errors[metric] += 1
+                    print(f"Error getting {metric}: {e}")
+        self.sample_time.observe(time.perf_counter() - sample_start)
         self.last_update = time.time()
-        self.update_interval = update_interval # seconds
+        # Single reference assignment, readers on other threads never see a partial update
+        snapshot = MetricsSnapshot(self.snapshot.seq + 1, time.monotonic(), MappingProxyType(dict(self.metrics)),
+                                   frozenset(stale))
+        with self.published:
+            self.snapshot = snapshot
+            self.published.notify_all()
+        return snapshot
 
-    def get_metrics(self, temp_unit):
-        if time.time() - self.last_update < self.update_interval:
-            metrics = self.metrics.copy()
-            metrics['updated'] = False
-        else:
-            for metric, function in self.metrics_functions.items():
-                if function is not None:
-                    try:
-                        result = function()
-                        if result is None:
-                            self.metrics[metric] = 0
-                        else:
-                            self.metrics[metric] = int(result)
-                    except Exception as e:
-                        print(f"Error getting {metric}: {e}")
-            self.last_update = time.time()
-            metrics = self.metrics.copy()
-            metrics['updated'] = True
+    def wait_for_snapshot(self, reader, timeout):
+        """Block until a snapshot reader hasn't read yet is published, at most timeout seconds; True if one was"""
+        seq = self.last_read_seq.get(reader, 0)
+        with self.published:
+            return self.published.wait_for(lambda: self.snapshot.seq != seq, max(0.0, timeout))
+
+    def start(self):
+        """Sample in a background thread every update_interval, so slow sensors never block the caller"""
+        if self.thread is None:
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self.sampler_loop, name="metrics-sampler", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        if self.thread is not None:
+            self.stop_event.set()
+            self.thread.join()
+            self.thread = None
+
+    def sampler_loop(self):
+        while not self.stop_event.is_set():
+            started = time.monotonic()
+            try:
+                self.sample()
+            except Exception as e:
+                # Keep sampling, a dead sampler would freeze the displays on the last snapshot
+                print(f"Error sampling metrics: {e!r}")
+            self.stop_event.wait(max(0, self.update_interval - (time.monotonic() - started)))
+
+    def get_metrics(self, temp_unit, reader=None):
+        """
+        Latest metric values, with 'updated' set when a new snapshot was published since the previous call
+        by the same reader (several displays can share one Metrics), and 'stale' the metrics whose
+        source missed its deadline.
+        Without a running sampler thread, collectors are run inline once update_interval has elapsed.
+        """
+        if self.thread is None and time.time() - self.last_update >= self.update_interval:
+            self.sample()
+        snapshot = self.snapshot
+        metrics = dict(snapshot.values)
+        metrics['updated'] = snapshot.seq != self.last_read_seq.get(reader, 0)
+        metrics['stale'] = snapshot.stale
+        self.last_read_seq[reader] = snapshot.seq
 
         for device in ["cpu", "gpu"]:
             if temp_unit[device] == "fahrenheit":
-                metrics[f"{device}_temp"] = int(metrics[f"{device}_temp"] * 9 / 5 + 32)
+                for key in (f"{device}_temp", f"{device}_temp_max"):
+                    if key in metrics:
+                        metrics[key] = int(metrics[key] * 9 / 5 + 32)
         return metrics
 
-    def get_gpu_usage_amd(self):
+    def get_stats(self):
+        return {
+            "sample_time": self.sample_time.summary(),
+            "collectors": {
+                metric: dict(self.collector_time[metric].summary(), source=self.metrics_sources[metric],
+                             errors=self.collector_errors[metric])
+                for metric in self.metrics_functions
+            },
+            "backends": {worker.name: worker.get_stats() for worker in self.workers},
+            "stale": sorted(self.snapshot.stale),
+        }
+
+    def collect_stats(self, text):
+        """Add the sampling latencies to a stats.PrometheusText"""
+        text.histogram("metrics_sample_seconds", self.sample_time, help_text="Time to sample every metric once")
+        for metric, histogram in self.collector_time.items():
+            if self.metrics_functions[metric] is not None:
+                labels = {"metric": metric, "source": self.metrics_sources[metric]}
+                text.histogram("metrics_collector_seconds", histogram, labels, help_text="Time to read one metric")
+                text.add("metrics_collector_errors_total", "counter", self.collector_errors[metric], labels,
+                         help_text="Failed reads of one metric")
+                text.add("metrics_stale", "gauge", int(metric in self.snapshot.stale), labels,
+                         help_text="1 when the metric's source missed its deadline and the value is the last good one")
+        for worker in self.workers:
+            labels = {"source": worker.name}
+            text.add("metrics_backend_timeouts_total", "counter", worker.timeouts, labels,
+                     help_text="Backend reads that missed their deadline")
+            text.add("metrics_backend_quarantined", "gauge", int(worker.quarantined()), labels,
+                     help_text="1 while the backend is skipped after repeated timeouts")
+
+
+class AmdGpuBackend:
+    """AMD GPU temperature, load and clock through pyamdgpuinfo, imported and opened on first read."""
+    name = "amdgpuinfo"
+    provides = {'gpu_temp': 'get_gpu_temp', 'gpu_usage': 'get_gpu_usage', 'gpu_speed': 'get_gpu_speed'}
+
+    def __init__(self):
+        self.gpu = None
+        self.opened = False
+
+    def open(self):
+        if not self.opened:
+            self.opened = True
+            self.gpu = open_amd_gpu()
+        return self.gpu
+
+    def get_gpu_usage(self):
         try:
-            if self.gpu is None:
+            if self.open() is None:
                 return None
             else:
                 return int(self.gpu.query_load()*100)
         except :
             return None
         
-    def get_gpu_temp_amdgpuinfo(self):
+    def get_gpu_temp(self):
         try:
+            if self.open() is None:
+                return None
             return self.gpu.query_temperature()
         except Exception as e:
             print(f"Error getting AMD GPU temperature: {e}")
             return None
 
-    def get_gpu_speed_amd(self):
+    def get_gpu_speed(self):
         try:
-            if self.gpu is None:
+            if self.open() is None:
                 return None
             else:
                 # Get current GPU clock in MHz
@@ -133,8 +608,360 @@ class Metrics:
             print(f"Error getting AMD GPU speed: {e}")
             return None
 
+class NvmlBackend:
+    """
+    Keeps one NVML session and device handle open, and reads temperature, utilization and
+    graphics clock in a single pass per metrics update. The session is re-initialized after
+    an NVML error and shut down at exit.
+    """
+    name = "nvml"
+    provides = {'gpu_temp': 'get_gpu_temp', 'gpu_usage': 'get_gpu_usage', 'gpu_speed': 'get_gpu_speed'}
+
+    def __init__(self, index=0, nvml=None):
+        self.index = index
+        self.nvml = nvml  # pynvml module, imported on first use unless given (e.g. a stub)
+        self.handle = None
+        self.sample = None
+        atexit.register(self.shutdown)
+
+    def init(self):
+        if self.nvml is None:
+            import pynvml
+            self.nvml = pynvml
+        self.nvml.nvmlInit()
+        if self.nvml.nvmlDeviceGetCount() <= self.index:
+            self.nvml.nvmlShutdown()
+            raise RuntimeError(f"no NVIDIA GPU at index {self.index}")
+        self.handle = self.nvml.nvmlDeviceGetHandleByIndex(self.index)
+
+    def shutdown(self):
+        if self.handle is not None:
+            self.handle = None
+            try:
+                self.nvml.nvmlShutdown()
+            except Exception:
+                pass
+
+    def invalidate(self):
+        """Force the next read to query the driver again"""
+        self.sample = None
+
+    def read(self):
+        if self.sample is None:
+            try:
+                if self.handle is None:
+                    self.init()
+                nvml = self.nvml
+                self.sample = {
+                    'gpu_temp': nvml.nvmlDeviceGetTemperature(self.handle, nvml.NVML_TEMPERATURE_GPU),
+                    'gpu_usage': int(nvml.nvmlDeviceGetUtilizationRates(self.handle).gpu),
+                    'gpu_speed': int(nvml.nvmlDeviceGetClockInfo(self.handle, nvml.NVML_CLOCK_GRAPHICS)),
+                }
+            except Exception:
+                # Re-initialize NVML on the next update
+                self.shutdown()
+                self.sample = {}
+        return self.sample
+
+    def get_gpu_temp(self):
+        return self.read().get('gpu_temp')
+
+    def get_gpu_usage(self):
+        return self.read().get('gpu_usage')
+
+    def get_gpu_speed(self):
+        return self.read().get('gpu_speed')
+
+class NvidiaSmiBackend:
+    """
+    Reads temperature, utilization and graphics clock with a single nvidia-smi query.
+    With loop_ms set, one long-lived `nvidia-smi --loop-ms` child streams CSV lines that a reader
+    thread parses, so no process is spawned per sample; if the child exits, one-shot queries are used.
+    A streamed sample older than STALE_PERIODS loop periods, or a one-shot query running past the
+    deadline, raises TimeoutError so the values are marked stale instead of published as fresh.
+    """
+    STALE_PERIODS = 3
+    QUERY = 'index,temperature.gpu,utilization.gpu,clocks.current.graphics'
+    FIELDS = ('gpu_temp', 'gpu_usage', 'gpu_speed')
+    name = "nvidia_smi"
+    deadline = 2.0  # one-shot queries spawn a process, slow on the first call after the driver idles
+    provides = {'gpu_temp': 'get_gpu_temp', 'gpu_usage': 'get_gpu_usage', 'gpu_speed': 'get_gpu_speed'}
+
+    def __init__(self, index=0, loop_ms=None, command='nvidia-smi', stream_ms=None):
+        self.index = index
+        self.loop_ms = loop_ms
+        self.stream_ms = stream_ms  # loop_ms used once activate()d, so probing never starts the stream
+        self.command = command
+        self.sample = None
+        self.latest = None
+        self.latest_time = None
+        self.process = None
+        self.reader = None
+        atexit.register(self.close)
+
+    def parse(self, line):
+        """'0, 45, 12, 1410' -> {'gpu_temp': 45.0, ...}, or None if the line is for another GPU"""
+        values = [v.strip() for v in line.split(',')]
+        if len(values) != len(self.FIELDS) + 1 or values[0] != str(self.index):
+            return None
+        sample = {}
+        for field, value in zip(self.FIELDS, values[1:]):
+            try:
+                sample[field] = float(value)
+            except ValueError:
+                pass  # '[N/A]' or '[Not Supported]'
+        return sample
+
+    def query_once(self):
+        output = subprocess.check_output(
+            [self.command, f'--query-gpu={self.QUERY}', '--format=csv,noheader,nounits'],
+            stderr=subprocess.DEVNULL, timeout=self.deadline,
+        ).decode()
+        for line in output.splitlines():
+            sample = self.parse(line)
+            if sample is not None:
+                return sample
+        return {}
+
+    def start_stream(self):
+        self.process = subprocess.Popen(
+            [self.command, f'--query-gpu={self.QUERY}', '--format=csv,noheader,nounits', f'--loop-ms={self.loop_ms}'],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, bufsize=1,
+        )
+        self.reader = threading.Thread(target=self.reader_loop, args=(self.process,), name="nvidia-smi-reader", daemon=True)
+        self.reader.start()
+
+    def reader_loop(self, process):
+        for line in process.stdout:
+            sample = self.parse(line)
+            if sample is not None:
+                self.latest = sample
+                self.latest_time = time.monotonic()
+        process.wait()
+
+    def invalidate(self):
+        self.sample = None
+
+    def activate(self):
+        if self.stream_ms:
+            self.loop_ms = self.stream_ms
+
+    def read(self):
+        if self.loop_ms:
+            if self.process is None:
+                try:
+                    self.start_stream()
+                except FileNotFoundError:
+                    self.loop_ms = None
+                except Exception as e:
+                    print(f"Could not start streaming nvidia-smi, using one-shot queries: {e}")
+                    self.loop_ms = None
+            elif self.process.poll() is not None:
+                print(f"Streaming nvidia-smi exited with code {self.process.returncode}, using one-shot queries.")
+                self.loop_ms = None
+                self.latest = None
+            if self.latest is not None:
+                age = time.monotonic() - self.latest_time
+                if self.loop_ms and age > self.STALE_PERIODS * self.loop_ms / 1000:
+                    raise TimeoutError(f"no line from streaming nvidia-smi for {age:.1f}s")
+                return self.latest
+        # One-shot query, also used to prime the stream before its first line arrives
+        if self.sample is None:
+            try:
+                self.sample = self.query_once()
+            except subprocess.TimeoutExpired:
+                raise TimeoutError(f"nvidia-smi didn't answer within {self.deadline}s")
+            except Exception:
+                self.sample = {}
+        return self.sample
+
+    def close(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+    def get_gpu_temp(self):
+        return self.read().get('gpu_temp')
+
+    def get_gpu_usage(self):
+        return self.read().get('gpu_usage')
+
+    def get_gpu_speed(self):
+        return self.read().get('gpu_speed')
+
+class SysfsBackend:
+    """
+    Reads CPU temperature and frequency straight from sysfs. The hwmon temp*_input and cpufreq
+    scaling_cur_freq files are resolved once and kept open; each sample is one pread per file,
+    without the hwmon directory walk psutil.sensors_temperatures() does on every call.
+    """
+    name = "sysfs"
+    provides = {'cpu_temp': 'get_cpu_temp', 'cpu_temp_max': 'get_cpu_temp_max', 'cpu_speed': 'get_cpu_speed'}
+    # Same preference order as get_cpu_temp_psutils
+    HWMON_NAMES = ['coretemp', 'cpu_thermal', 'k10temp', 'acpitz']
+
+    def __init__(self, root='/'):
+        self.root = root
+        self.temp_fd = None
+        self.temp_fds = []
+        self.freq_fds = []
+        try:
+            self.temp_fds = self.open_temp_inputs()
+        except OSError as e:
+            print(f"Could not open hwmon temperature inputs: {e}")
+        if self.temp_fds:
+            self.temp_fd = self.temp_fds[0]
+        for path in sorted(glob.glob(os.path.join(root, 'sys/devices/system/cpu/cpu[0-9]*/cpufreq/scaling_cur_freq'))):
+            try:
+                self.freq_fds.append(os.open(path, os.O_RDONLY))
+            except OSError:
+                continue
+        atexit.register(self.close)
+
+    def open_temp_inputs(self):
+        """Open every temp*_input of the preferred CPU hwmon chip, first sensor first"""
+        chips = {}
+        for hwmon in glob.glob(os.path.join(self.root, 'sys/class/hwmon/hwmon*')):
+            try:
+                with open(os.path.join(hwmon, 'name')) as f:
+                    chips.setdefault(f.read().strip(), hwmon)
+            except OSError:
+                continue
+        for name in self.HWMON_NAMES:
+            if name in chips:
+                inputs = glob.glob(os.path.join(chips[name], 'temp*_input'))
+                if inputs:
+                    # The first sensor is the package temperature on coretemp, the others are per core
+                    inputs.sort(key=lambda p: int(re.search(r'temp(\d+)_input$', p).group(1)))
+                    return [os.open(path, os.O_RDONLY) for path in inputs]
+        return []
+
+    @staticmethod
+    def read_int(fd):
+        return int(os.pread(fd, 32, 0))
+
+    def get_cpu_temp(self):
+        if self.temp_fd is None:
+            return None
+        try:
+            return self.read_int(self.temp_fd) / 1000.0
+        except (OSError, ValueError):
+            return None
+
+    def get_cpu_temp_max(self):
+        """Temperature of the hottest sensor of the chip (hottest core on coretemp)"""
+        if not self.temp_fds:
+            return None
+        try:
+            return max(self.read_int(fd) for fd in self.temp_fds) / 1000.0
+        except (OSError, ValueError):
+            return None
+
+    def get_cpu_speed(self):
+        """Average current frequency over all CPUs in MHz, like psutil.cpu_freq()"""
+        if not self.freq_fds:
+            return None
+        try:
+            return int(sum(self.read_int(fd) for fd in self.freq_fds) / len(self.freq_fds) / 1000)
+        except (OSError, ValueError):
+            return None
+
+    def close(self):
+        for fd in self.temp_fds + self.freq_fds:
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        self.temp_fd = None
+        self.temp_fds = []
+        self.freq_fds = []
+
+class ProcStatBackend:
+    """
+    CPU utilization from /proc/stat, aggregate and per core. The previous jiffy counters are kept
+    in a NumPy array so each sample is one read and one vectorized delta, whatever the core count.
+    The first sample is the average since boot instead of psutil's meaningless first value.
+    """
+    name = "proc_stat"
+    provides = {'cpu_usage': 'get_cpu_usage', 'cpu_usage_max': 'get_cpu_usage_max'}
+    # user nice system idle iowait irq softirq steal (guest time is already counted in user/nice)
+    BUSY_COLUMNS = 8
+    IDLE_COLUMNS = [3, 4]
+
+    def __init__(self, path='/proc/stat'):
+        self.path = path
+        self.fd = None
+        self.previous = None
+        self.sample = None
+        self.per_core = None  # usage % of each core from the last sample
+        self.busiest_core = None
+        try:
+            self.fd = os.open(path, os.O_RDONLY)
+        except OSError as e:
+            print(f"Could not open {path}: {e}")
+        atexit.register(self.close)
+
+    def read_counters(self):
+        """(1 + cores, BUSY_COLUMNS) array, row 0 being the aggregate 'cpu' line"""
+        chunks = []
+        offset = 0
+        while True:
+            chunk = os.pread(self.fd, 65536, offset)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            offset += len(chunk)
+        rows = [line.split()[1:self.BUSY_COLUMNS + 1]
+                for line in b''.join(chunks).split(b'\n') if line.startswith(b'cpu')]
+        return np.array(rows, dtype=np.int64)
+
+    def invalidate(self):
+        self.sample = None
+
+    def read(self):
+        if self.sample is None:
+            try:
+                counters = self.read_counters()
+                previous = self.previous
+                if previous is None or previous.shape != counters.shape:
+                    # First sample, or CPUs were hot-plugged: average since boot
+                    previous = np.zeros_like(counters)
+                delta = counters - previous
+                total = delta.sum(axis=1)
+                idle = delta[:, self.IDLE_COLUMNS].sum(axis=1)
+                usage = np.where(total > 0, 100.0 * (total - idle) / np.maximum(total, 1), 0.0)
+                self.previous = counters
+                self.per_core = usage[1:]
+                self.busiest_core = int(np.argmax(self.per_core)) if len(self.per_core) else None
+                self.sample = {
+                    'cpu_usage': float(usage[0]),
+                    'cpu_usage_max': float(self.per_core.max()) if len(self.per_core) else float(usage[0]),
+                }
+            except Exception:
+                self.sample = {}
+        return self.sample
+
+    def get_cpu_usage(self):
+        if self.fd is None:
+            return None
+        return self.read().get('cpu_usage')
+
+    def get_cpu_usage_max(self):
+        if self.fd is None:
+            return None
+        return self.read().get('cpu_usage_max')
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
 def get_cpu_temp_psutils():
     try:
+        import psutil  # only loaded when the sysfs collectors can't be used
         if hasattr(psutil, 'sensors_temperatures'):
             temps = psutil.sensors_temperatures()
             if temps:
@@ -152,73 +979,24 @@ def get_cpu_temp_linux():
         return None
 def get_cpu_temp_raspberry_pi():
     try:
-        output = subprocess.check_output(['vcgencmd', 'measure_temp']).decode()
+        output = subprocess.check_output(['vcgencmd', 'measure_temp'], timeout=2).decode()
         return float(re.search(r'temp=(\d+\.\d+)', output).group(1))
     except Exception:
         return None
 
-def get_gpu_temp_nvidia():
-    # Try NVIDIA GPU first
-    try:
-        # Try using pynvml library
-        try:
-            from pynvml import nvmlInit, nvmlDeviceGetCount, nvmlDeviceGetHandleByIndex, \
-                            nvmlDeviceGetTemperature, NVML_TEMPERATURE_GPU, nvmlShutdown
-            
-            nvmlInit()
-            device_count = nvmlDeviceGetCount()
-            
-            if device_count > 0:
-                handle = nvmlDeviceGetHandleByIndex(0)
-                temp = nvmlDeviceGetTemperature(handle, NVML_TEMPERATURE_GPU)
-                nvmlShutdown()
-                return temp
-            
-            nvmlShutdown()
-        except:
-            # Try using nvidia-smi command
-            output = subprocess.check_output(['nvidia-smi', '--query-gpu=temperature.gpu', '--format=csv,noheader']).decode()
-            return float(output.strip().split('\n')[0])
-    except:
-        return None
-
 def get_cpu_usage():
     """Get CPU usage percentage."""
     try:
+        import psutil
         return psutil.cpu_percent(interval=None)
     except:
         print("Warning: Could not retrieve CPU usage.")
         return None
 
-def get_gpu_usage_nvidia_smi():
-    try: 
-        output = subprocess.check_output(
-            ['nvidia-smi', '--query-gpu=utilization.gpu',
-                '--format=csv,noheader']
-        ).decode().strip()
-        return int(output.split()[0])
-    except Exception:
-        return None
-    
-def get_gpu_usage_nvml():
-    try:
-        # NVIDIA GPUs using pynvml
-        from pynvml import (nvmlInit, nvmlShutdown,
-                        nvmlDeviceGetHandleByIndex,
-                        nvmlDeviceGetUtilizationRates)
-        nvmlInit()
-        try:
-            handle = nvmlDeviceGetHandleByIndex(0)
-            utilization = nvmlDeviceGetUtilizationRates(handle)
-            return int(utilization.gpu)
-        finally:
-            nvmlShutdown()
-    except:
-        return None
-
 def get_cpu_speed_psutil():
     """Get CPU frequency using psutil."""
     try:
+        import psutil
         freq = psutil.cpu_freq()
         if freq is not None and freq.current is not None:
             return int(freq.current)
@@ -238,35 +1016,3 @@ def get_cpu_speed_proc():
         return None
     except Exception:
         return None
-
-def get_gpu_speed_nvml():
-    """Get GPU clock speed using pynvml."""
-    try:
-        from pynvml import (nvmlInit, nvmlShutdown,
-                        nvmlDeviceGetHandleByIndex,
-                        nvmlDeviceGetClockInfo, NVML_CLOCK_GRAPHICS)
-        nvmlInit()
-        try:
-            handle = nvmlDeviceGetHandleByIndex(0)
-            clock = nvmlDeviceGetClockInfo(handle, NVML_CLOCK_GRAPHICS)
-            return int(clock)
-        finally:
-            nvmlShutdown()
-    except:
-        return None
-
-def get_gpu_speed_nvidia_smi():
-    """Get GPU clock speed using nvidia-smi."""
-    try:
-        output = subprocess.check_output(
-            ['nvidia-smi', '--query-gpu=clocks.current.graphics',
-                '--format=csv,noheader']
-        ).decode().strip()
-        # Output is in MHz, extract number
-        match = re.search(r'(\d+)', output)
-        if match:
-            return int(match.group(1))
-        return None
-    except Exception:
-        return None
-
@@ -0,0 +1,72 @@
+import time
+from stats import Histogram
+
+
+class FrameScheduler:
+    """
+    Paces the render loop on absolute deadlines (start + n * interval) of the monotonic clock, so
+    work time and USB latency don't stretch the period. When a frame overruns one or more
+    deadlines, those frames are dropped and the loop resumes on the next deadline instead of
+    slowing down. Work time, start lateness and missed deadlines are recorded.
+    end_frame(wake) waits on wake(timeout) instead of sleeping; when it returns True before the
+    deadline (e.g. a new metrics snapshot), the deadlines are re-anchored on that moment.
+    """
+    def __init__(self, interval, clock=time.monotonic, sleep=time.sleep):
+        self.interval = interval
+        self.clock = clock
+        self.sleep = sleep
+        self.work_time = Histogram()
+        self.lateness = Histogram()
+        self.frames = 0
+        self.missed_deadlines = 0
+        self.wakeups = 0
+        self.reset()
+
+    def reset(self):
+        """Re-anchor the deadlines on now, e.g. after a pause or an interval change"""
+        self.deadline = self.clock()
+        self.frame_start = None
+
+    def set_interval(self, interval):
+        if interval != self.interval:
+            self.interval = interval
+            self.reset()
+
+    def begin_frame(self):
+        self.frame_start = self.clock()
+        self.lateness.observe(max(0.0, self.frame_start - self.deadline))
+
+    def end_frame(self, wake=None):
+        """Record the frame's work time and sleep until the next deadline, or until wake(timeout) returns True"""
+        now = self.clock()
+        self.frames += 1
+        if self.frame_start is not None:
+            self.work_time.observe(now - self.frame_start)
+        self.deadline += self.interval
+        if now > self.deadline:
+            # Overrun: drop the frames whose deadline already passed
+            missed = int((now - self.deadline) / self.interval) + 1
+            self.missed_deadlines += missed
+            self.deadline += missed * self.interval
+        timeout = max(0.0, self.deadline - now)
+        if wake is None:
+            self.sleep(timeout)
+        elif wake(timeout):
+            self.wakeups += 1
+            self.deadline = self.clock()
+
+    def get_stats(self):
+        return {
+            "interval": self.interval,
+            "frames": self.frames,
+            "missed_deadlines": self.missed_deadlines,
+            "wakeups": self.wakeups,
+            "work_time": self.work_time.summary(),
+            "lateness": self.lateness.summary(),
+        }
+
+    def collect_stats(self, text):
+        """Add the loop's timings to a stats.PrometheusText"""
+        text.histogram("frame_work_seconds", self.work_time, help_text="Time spent rendering and sending each frame")
+        text.histogram("frame_lateness_seconds", self.lateness, help_text="Delay between a frame's deadline and its start")
+        text.add("frame_missed_deadlines_total", "counter", self.missed_deadlines, help_text="Frames dropped after an overrun")
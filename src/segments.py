@@ -0,0 +1,108 @@
+from collections import OrderedDict
+import numpy as np
+from config import NUMBER_OF_LEDS
+
+SEGMENT_NAMES = ['a', 'b', 'c', 'd', 'e', 'f', 'g']
+
+digit_to_segments = {
+    0: ['a', 'b', 'c', 'd', 'e', 'f'],
+    1: ['b', 'c'],
+    2: ['a', 'b', 'g', 'e', 'd'],
+    3: ['a', 'b', 'g', 'c', 'd'],
+    4: ['f', 'g', 'b', 'c'],
+    5: ['a', 'f', 'g', 'c', 'd'],
+    6: ['a', 'f', 'g', 'e', 'c', 'd'],
+    7: ['a', 'b', 'c'],
+    8: ['a', 'b', 'c', 'd', 'e', 'f', 'g'],
+    9: ['a', 'b', 'g', 'f', 'c', 'd'],
+}
+
+# GLYPHS[digit, segment] is True when the segment (in SEGMENT_NAMES order) is lit for that digit
+GLYPHS = np.array([[name in digit_to_segments[digit] for name in SEGMENT_NAMES] for digit in range(10)])
+
+SINGLE_LEDS = [
+    "usage_percent_led", "usage_100s_led", "speed_mhz_led",
+    "temp_cpu_led", "temp_gpu_led", "temp_fahrenheit", "temp_celsius",
+]
+# Digit positions of each number, least significant first
+NUMBERS = {
+    "usage": ["usage_1s_digit", "usage_10s_digit"],
+    "speed": ["speed_digits"],
+    "temp": ["temp_1s_digit", "temp_10s_digit", "temp_100s_digit"],
+}
+
+
+class SegmentLayout:
+    """
+    layout.json compiled once into LED indexes: one (digits, 7) index array per number, least
+    significant digit first, so a whole number is drawn with a single scatter into the LED mask.
+    Raises ValueError on missing keys, duplicate or out of range LED indexes.
+    """
+    def __init__(self, layout, number_of_leds=NUMBER_OF_LEDS):
+        self.number_of_leds = number_of_leds
+        self.used = {}
+        for key in SINGLE_LEDS:
+            if key not in layout:
+                raise ValueError(f"missing key {key}")
+            setattr(self, key, self.check_index(layout[key], key))
+        self.digits = {}
+        for number, keys in NUMBERS.items():
+            rows = []
+            for key in keys:
+                if key not in layout:
+                    raise ValueError(f"missing key {key}")
+                for position, digit in enumerate(layout[key]):
+                    segment_map = digit.get('map', {})
+                    missing = [name for name in SEGMENT_NAMES if name not in segment_map]
+                    if missing:
+                        raise ValueError(f"{key}[{position}] has no LED for segments {missing}")
+                    rows.append([self.check_index(segment_map[name], f"{key}[{position}].{name}")
+                                 for name in SEGMENT_NAMES])
+            self.digits[number] = np.array(rows, dtype=np.intp).reshape(-1, len(SEGMENT_NAMES))
+        self.powers = 10 ** np.arange(max(len(rows) for rows in self.digits.values()))
+
+    def check_index(self, index, name):
+        if isinstance(index, bool) or not isinstance(index, int) or not 0 <= index < self.number_of_leds:
+            raise ValueError(f"{name}: LED index {index!r} out of range 0-{self.number_of_leds - 1}")
+        if index in self.used:
+            raise ValueError(f"{name}: LED index {index} already used by {self.used[index]}")
+        self.used[index] = name
+        return index
+
+    def draw(self, leds, number, value):
+        """Light the segments of value on the digits of number ('usage', 'speed' or 'temp'), without leading zeros"""
+        value = int(value)
+        rows = self.digits[number]
+        count = min(len(str(value)), len(rows))
+        digits = value // self.powers[:count] % 10
+        leds[rows[:count][GLYPHS[digits]]] = 1
+
+
+class MaskCache:
+    """Bounded LRU cache of read-only LED masks, keyed by the values they display."""
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.masks = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def freeze(mask):
+        mask.flags.writeable = False
+        return mask
+
+    def get(self, key):
+        mask = self.masks.get(key)
+        if mask is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.masks.move_to_end(key)
+        return mask
+
+    def put(self, key, mask):
+        self.masks[key] = self.freeze(mask)
+        self.masks.move_to_end(key)
+        if len(self.masks) > self.maxsize:
+            self.masks.popitem(last=False)
+        return mask
@@ -0,0 +1,149 @@
+import bisect
+import os
+import time
+
+# Upper bounds of the histogram buckets, in seconds
+DEFAULT_BUCKETS = (0.0001, 0.0002, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0)
+
+
+class Histogram:
+    """Fixed-bucket histogram of durations in seconds; observe() is a bisect and two additions."""
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile (max for the +Inf bucket)"""
+        if self.count == 0:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": round(self.sum / self.count * 1000, 3) if self.count else 0.0,
+            "p50_ms": round(self.quantile(0.5) * 1000, 3),
+            "p99_ms": round(self.quantile(0.99) * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+    def prometheus_buckets(self):
+        """Cumulative (le, count) pairs, ending with +Inf, as in the Prometheus histogram format"""
+        seen = 0
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            seen += count
+            yield bound, seen
+
+
+class StageTimer:
+    """
+    Per-frame time spent in each stage of the render loop. add() accumulates during a frame (a stage can
+    run several times per frame), end_frame() records each stage's total into its histogram.
+    """
+    def __init__(self, stages):
+        self.histograms = {stage: Histogram() for stage in stages}
+        self.current = dict.fromkeys(stages, 0.0)
+
+    def add(self, stage, seconds):
+        self.current[stage] += seconds
+
+    def end_frame(self):
+        for stage, seconds in self.current.items():
+            self.histograms[stage].observe(seconds)
+            self.current[stage] = 0.0
+
+    def summary(self):
+        return {stage: histogram.summary() for stage, histogram in self.histograms.items()}
+
+
+class PrometheusText:
+    """Collects samples and renders them in the Prometheus text exposition format, one block per family."""
+    def __init__(self, prefix="digital_lcd"):
+        self.prefix = prefix
+        self.families = {}
+
+    @staticmethod
+    def format_labels(labels):
+        if not labels:
+            return ""
+        escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in labels.values())
+        return "{" + ",".join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + "}"
+
+    def family(self, name, kind, help_text):
+        name = f"{self.prefix}_{name}"
+        if name not in self.families:
+            self.families[name] = (kind, help_text, [])
+        return name, self.families[name][2]
+
+    def add(self, name, kind, value, labels=None, help_text=""):
+        name, samples = self.family(name, kind, help_text)
+        samples.append(f"{name}{self.format_labels(labels)} {value}")
+
+    def histogram(self, name, histogram, labels=None, help_text=""):
+        name, samples = self.family(name, "histogram", help_text)
+        labels = labels or {}
+        for bound, count in histogram.prometheus_buckets():
+            samples.append(f"{name}_bucket{self.format_labels(dict(labels, le=bound))} {count}")
+        samples.append(f"{name}_sum{self.format_labels(labels)} {histogram.sum}")
+        samples.append(f"{name}_count{self.format_labels(labels)} {histogram.count}")
+
+    def render(self):
+        lines = []
+        for name, (kind, help_text, samples) in self.families.items():
+            if help_text:
+                lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+class TextfileExporter:
+    """
+    Periodically writes collected stats to a node_exporter textfile collector file. The file is
+    replaced atomically so node_exporter never reads a partial one.
+    """
+    def __init__(self, path=None, interval=15.0, clock=time.monotonic):
+        self.path = path
+        self.interval = interval
+        self.clock = clock
+        self.last_write = None
+
+    def configure(self, path, interval):
+        self.path = path
+        self.interval = interval
+
+    def maybe_write(self, collect):
+        """Call collect(PrometheusText) and write the result if path is set and interval elapsed"""
+        if not self.path:
+            return False
+        now = self.clock()
+        if self.last_write is not None and now - self.last_write < self.interval:
+            return False
+        self.last_write = now
+        text = PrometheusText()
+        collect(text)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                f.write(text.render())
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Error writing stats to {self.path}: {e}")
+            return False
+        return True
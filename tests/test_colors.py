@@ -0,0 +1,87 @@
+import random
+
+import numpy as np
+import pytest
+
+from colors import ColorContext, GradientTable, MetricGradient, MultiStopGradient, interpolate_rgb
+
+
+def context(metric, value, low=None, high=None):
+    return ColorContext({metric: value}, 0, 5, None, {metric: low}, {metric: high})
+
+
+def multi_stop_reference(gradient, value):
+    """MultiStopGradient.color() before the lookup table"""
+    values = gradient.values
+    if value <= values[0]:
+        return gradient.palette[0]
+    if value >= values[-1]:
+        return gradient.palette[-1]
+    for j in range(len(values) - 1):
+        if values[j] <= value < values[j + 1]:
+            factor = (value - values[j]) / (values[j + 1] - values[j])
+            return interpolate_rgb(gradient.palette[j], gradient.palette[j + 1], factor)
+
+
+def metric_gradient_reference(gradient, value, low, high):
+    factor = max(0, min(1, (value - low) / (high - low)))
+    return interpolate_rgb(gradient.start_rgb, gradient.end_rgb, factor)
+
+
+def random_color(rng):
+    return f"{rng.randrange(1 << 24):06x}"
+
+
+def render(gradient, ctx):
+    frame = np.zeros((1, 3), dtype=np.uint8)
+    gradient.render(frame, np.array([0]), ctx)
+    return frame[0]
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_multi_stop_table_matches_interpolation(seed):
+    rng = random.Random(seed)
+    # Duplicate stop values included
+    stops = sorted((rng.randint(-10, 120), random_color(rng)) for _ in range(rng.randint(1, 5)))
+    gradient = MultiStopGradient("cpu_temp", stops)
+    assert gradient.table is not None
+    for value in range(-30, 150):
+        assert np.array_equal(gradient.color(context("cpu_temp", value)), multi_stop_reference(gradient, value)), value
+
+
+def test_multi_stop_fractional_value_is_interpolated():
+    gradient = MultiStopGradient("cpu_temp", [(40, "00ff00"), (90, "ff0000")])
+    # Between two entries of the integer table
+    assert gradient.table.lookup(40.5) is None
+    assert np.array_equal(gradient.color(context("cpu_temp", 40.5)), multi_stop_reference(gradient, 40.5))
+
+
+@pytest.mark.parametrize("low, high", [(30, 90), (20.5, 85.2), (90, 30), (0, 100), (-5, 3)])
+def test_metric_gradient_table_matches_interpolation(low, high):
+    rng = random.Random(f"{low}-{high}")
+    gradient = MetricGradient(random_color(rng), random_color(rng), "cpu_temp")
+    for value in range(-30, 150):
+        expected = metric_gradient_reference(gradient, value, low, high).astype(np.uint8)
+        assert np.array_equal(render(gradient, context("cpu_temp", value, low, high)), expected), value
+
+
+def test_metric_gradient_rebuilds_table_when_bounds_change():
+    gradient = MetricGradient("000000", "ffffff", "gpu_temp")
+    render(gradient, context("gpu_temp", 60, 30, 90))
+    table = gradient.table
+    render(gradient, context("gpu_temp", 70, 30, 90))
+    assert gradient.table is table
+    color = render(gradient, context("gpu_temp", 60, 50, 70))
+    assert gradient.table is not table
+    assert (gradient.table.low, gradient.table.high) == (50, 70)
+    assert np.array_equal(color, metric_gradient_reference(gradient, 60, 50, 70))
+
+
+def test_metric_gradient_fractional_value_and_wide_range_are_interpolated():
+    gradient = MetricGradient("000000", "ffffff", "cpu_speed")
+    color = render(gradient, context("cpu_speed", 2500.5, 0, 5000))
+    assert np.array_equal(color, metric_gradient_reference(gradient, 2500.5, 0, 5000))
+    assert GradientTable.build(0, 10 ** 7, lambda values: values) is None
+    color = render(gradient, context("cpu_speed", 1234, 0, 10 ** 7))
+    assert gradient.table is None
+    assert np.array_equal(color, metric_gradient_reference(gradient, 1234, 0, 10 ** 7))
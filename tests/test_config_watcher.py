@@ -0,0 +1,24 @@
+import pytest
+
+from config_watcher import validate_config
+
+
+def test_devices_entries_select_distinct_displays():
+    config = {"devices": [{"serial": "A1B2", "display_mode": "cpu"}, {"path": "/dev/hidraw3", "name": "right"}]}
+    assert validate_config(config) is config
+
+
+@pytest.mark.parametrize("devices, message", [
+    ([{"display_mode": "cpu"}], "devices[0]: path or serial is required"),
+    ([{"serial": "A1B2"}, {"name": "right"}], "devices[1]: path or serial is required"),
+    ([{"serial": ""}], "devices[0]: path or serial is required"),
+    ([{"serial": "A1B2"}, {"serial": "A1B2"}], "devices[1]: serial 'A1B2' is already used by devices[0]"),
+    ([{"path": "/dev/hidraw3"}, {"serial": "A1B2"}, {"path": "/dev/hidraw3"}],
+     "devices[2]: path '/dev/hidraw3' is already used by devices[0]"),
+    ([{"serial": "A1B2", "name": "left"}, {"serial": "C3D4", "name": "left"}],
+     "devices[1]: name 'left' is already used by devices[0]"),
+])
+def test_devices_entries_need_a_unique_selector(devices, message):
+    with pytest.raises(ValueError) as e:
+        validate_config({"devices": devices})
+    assert str(e.value) == message
@@ -0,0 +1,221 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import device
+from config import NUMBER_OF_LEDS
+from device import HEADER, DeviceManager, HidWriter, PacketEncoder
+
+
+def hex_encode(colors, leds):
+    """The hex string encoder send_packets used before PacketEncoder"""
+    frame = np.where((leds != 0)[:, None], colors, 0).astype(np.uint8).tobytes()
+    header = HEADER.hex()
+    message = frame.hex()
+    packets = [bytes.fromhex(header + message[:128 - len(header)])]
+    rest = message[88:]
+    for i in range(0, 4):
+        packets.append(bytes.fromhex('00' + rest[i * 128:(i + 1) * 128]))
+    return packets
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_encode_matches_hex_encoder(seed):
+    rng = np.random.default_rng(seed)
+    colors = rng.integers(0, 256, size=(NUMBER_OF_LEDS, 3), dtype=np.uint8)
+    leds = rng.integers(0, 2, size=NUMBER_OF_LEDS)
+    packets = PacketEncoder().encode(colors, leds)
+    assert [bytes(packet) for packet in packets] == hex_encode(colors, leds)
+
+
+def test_encoder_buffer_is_reused():
+    encoder = PacketEncoder()
+    colors = np.full((NUMBER_OF_LEDS, 3), 7, dtype=np.uint8)
+    first = [bytes(packet) for packet in encoder.encode(colors, np.ones(NUMBER_OF_LEDS, dtype=int))]
+    second = [bytes(packet) for packet in encoder.encode(colors, np.zeros(NUMBER_OF_LEDS, dtype=int))]
+    assert first != second
+    assert second == hex_encode(colors, np.zeros(NUMBER_OF_LEDS, dtype=int))
+
+
+class FakeDevice:
+    """Records writes; writes block while gate is cleared, and raise once error is set"""
+    def __init__(self):
+        self.written = []
+        self.closed = False
+        self.gate = threading.Event()
+        self.gate.set()
+        self.writing = threading.Event()
+        self.error = None
+
+    def write(self, data):
+        self.writing.set()
+        self.gate.wait(5)
+        if self.error:
+            raise self.error
+        self.written.append(bytes(data))
+        return len(data)
+
+    def close(self):
+        self.closed = True
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_writer_keeps_only_the_latest_pending_frame():
+    writer = HidWriter()
+    dev = FakeDevice()
+    dev.gate.clear()
+    try:
+        writer.submit(dev, [b'1'])
+        assert dev.writing.wait(5)
+        writer.submit(dev, [b'2'])
+        writer.submit(dev, [bytearray(b'3')])
+        dev.gate.set()
+        wait_for(lambda: writer.frames_written == 2)
+        assert dev.written == [b'1', b'3']
+        assert writer.frames_dropped == 1
+    finally:
+        writer.close()
+
+
+def test_writer_stops_writing_to_a_failed_device():
+    writer = HidWriter()
+    dev = FakeDevice()
+    dev.error = OSError("device unplugged")
+    try:
+        writer.submit(dev, [b'1'])
+        wait_for(lambda: writer.failed is dev)
+        assert writer.errors == 1
+        assert "device unplugged" in writer.get_stats()["last_error"]
+        dev.error = None
+        writer.submit(dev, [b'2'])
+        wait_for(lambda: writer.pending is None)
+        other = FakeDevice()
+        writer.submit(other, [b'3'])
+        wait_for(lambda: other.written)
+        assert dev.written == []
+        assert writer.frames_dropped == 0
+    finally:
+        writer.close()
+
+
+class FakeEvents:
+    """Replays queued (action, devname) uevents"""
+    def __init__(self):
+        self.queue = []
+
+    def read(self):
+        events, self.queue = self.queue, []
+        return events
+
+    def wait(self, timeout):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeOpener:
+    """open_device for DeviceManager: fails while plugged is False, opens /dev/hidrawN otherwise"""
+    def __init__(self, node="hidraw3"):
+        self.node = node
+        self.plugged = True
+        self.opened = []
+
+    def __call__(self):
+        if not self.plugged:
+            raise OSError("no such device")
+        dev = FakeDevice()
+        self.opened.append(dev)
+        return dev, f"/dev/{self.node}".encode()
+
+
+def test_device_manager_retries_with_backoff_and_on_add():
+    now = [0.0]
+    opener = FakeOpener()
+    opener.plugged = False
+    events = FakeEvents()
+    manager = DeviceManager(opener, events=events, min_backoff=0.5, max_backoff=4, clock=lambda: now[0])
+    backoffs = []
+    for _ in range(5):
+        assert manager.get() is None
+        backoffs.append(manager.backoff)
+        now[0] = manager.next_attempt
+    assert backoffs == [0.5, 1.0, 2.0, 4, 4]
+    # Plugged in: the add uevent retries right away instead of waiting for the backoff
+    opener.plugged = True
+    events.queue.append(("add", "hidraw3"))
+    assert manager.get() is opener.opened[0]
+    assert manager.get_stats() == {"open": True, "opens": 1, "failures": 0, "backoff": 0}
+
+
+def test_device_manager_retries_soon_when_the_first_open_after_add_fails():
+    now = [0.0]
+    opener = FakeOpener()
+    opener.plugged = False
+    events = FakeEvents()
+    manager = DeviceManager(opener, events=events, min_backoff=0.5, max_backoff=60, clock=lambda: now[0])
+    while manager.backoff < 60:
+        manager.get()
+        now[0] = manager.next_attempt
+    # udev hasn't applied the permissions rule yet when the kernel add uevent arrives
+    events.queue.append(("add", "hidraw3"))
+    assert manager.get() is None
+    assert manager.next_attempt - now[0] == 0.5
+    opener.plugged = True
+    now[0] = manager.next_attempt
+    assert manager.get() is opener.opened[0]
+
+
+def test_device_manager_only_closes_on_its_own_remove():
+    opener = FakeOpener("hidraw3")
+    events = FakeEvents()
+    closed = []
+    manager = DeviceManager(opener, events=events, close_device=closed.append)
+    dev = manager.get()
+    events.queue.append(("remove", "hidraw7"))
+    assert manager.get() is dev
+    assert closed == []
+    opener.plugged = False
+    events.queue.append(("remove", "hidraw3"))
+    assert manager.get() is None
+    assert closed == [dev]
+
+
+def test_device_manager_polls_without_events(monkeypatch):
+    def no_netlink():
+        raise OSError("netlink not available")
+    monkeypatch.setattr(device, "UeventSource", no_netlink)
+    opener = FakeOpener()
+    opener.plugged = False
+    manager = DeviceManager(opener, max_backoff=60, poll_interval=5, clock=lambda: 0.0)
+    assert manager.events is None
+    for _ in range(10):
+        manager.try_open()
+    assert manager.backoff == 5
+
+
+def test_close_waits_for_the_write_in_progress():
+    writer = HidWriter()
+    opener = FakeOpener()
+    manager = DeviceManager(opener, events=FakeEvents(), close_device=writer.retire)
+    try:
+        dev = manager.get()
+        dev.gate.clear()
+        writer.submit(dev, [b'1'])
+        assert dev.writing.wait(5)
+        manager.reopen()
+        assert not dev.closed  # still inside write()
+        dev.gate.set()
+        wait_for(lambda: dev.closed)
+        assert dev.written == [b'1']
+        assert manager.get() is opener.opened[1]
+    finally:
+        writer.close()
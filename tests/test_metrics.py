@@ -0,0 +1,255 @@
+import threading
+import time
+import types
+
+import metrics
+from metrics import BackendWorker, FunctionBackend, NvidiaSmiBackend, NvmlBackend, ProcStatBackend, SysfsBackend
+
+
+class StubNvml:
+    """Stands in for pynvml: counts driver calls, fail makes the next reads raise"""
+    NVML_TEMPERATURE_GPU = 0
+    NVML_CLOCK_GRAPHICS = 0
+
+    def __init__(self):
+        self.inits = 0
+        self.shutdowns = 0
+        self.reads = 0
+        self.fail = False
+
+    def nvmlInit(self):
+        self.inits += 1
+
+    def nvmlShutdown(self):
+        self.shutdowns += 1
+
+    def nvmlDeviceGetCount(self):
+        return 1
+
+    def nvmlDeviceGetHandleByIndex(self, index):
+        return f"handle{index}"
+
+    def nvmlDeviceGetTemperature(self, handle, sensor):
+        self.reads += 1
+        if self.fail:
+            raise RuntimeError("GPU is lost")
+        return 61
+
+    def nvmlDeviceGetUtilizationRates(self, handle):
+        return types.SimpleNamespace(gpu=37)
+
+    def nvmlDeviceGetClockInfo(self, handle, clock):
+        return 1710
+
+
+def test_nvml_initializes_once_and_reads_once_per_sample():
+    nvml = StubNvml()
+    backend = NvmlBackend(nvml=nvml)
+    for _ in range(3):
+        backend.invalidate()
+        assert (backend.get_gpu_temp(), backend.get_gpu_usage(), backend.get_gpu_speed()) == (61, 37, 1710)
+    assert nvml.inits == 1
+    assert nvml.reads == 3
+    backend.shutdown()
+    assert nvml.shutdowns == 1
+
+
+def test_nvml_reinitializes_after_an_error():
+    nvml = StubNvml()
+    backend = NvmlBackend(nvml=nvml)
+    backend.get_gpu_temp()
+    nvml.fail = True
+    backend.invalidate()
+    assert backend.get_gpu_temp() is None
+    assert nvml.shutdowns == 1
+    nvml.fail = False
+    backend.invalidate()
+    assert backend.get_gpu_temp() == 61
+    assert nvml.inits == 2
+
+
+def fake_nvidia_smi(tmp_path):
+    """A nvidia-smi script logging its calls; --loop-ms streams lines until killed"""
+    calls = tmp_path / "calls"
+    script = tmp_path / "nvidia-smi"
+    script.write_text(
+        "#!/bin/sh\n"
+        f'echo "$@" >> {calls}\n'
+        'case "$*" in\n'
+        '  *loop-ms*) while true; do echo "1, 99, 99, 99"; echo "0, 52, 21, 1500"; sleep 0.02; done;;\n'
+        '  *) echo "0, 50, 10, 1400"; echo "1, 99, 99, 99";;\n'
+        "esac\n"
+    )
+    script.chmod(0o755)
+    return str(script), calls
+
+
+def test_nvidia_smi_reads_all_fields_in_one_query(tmp_path):
+    command, calls = fake_nvidia_smi(tmp_path)
+    backend = NvidiaSmiBackend(command=command)
+    assert (backend.get_gpu_temp(), backend.get_gpu_usage(), backend.get_gpu_speed()) == (50, 10, 1400)
+    assert len(calls.read_text().splitlines()) == 1
+
+
+def test_nvidia_smi_stream(tmp_path):
+    command, calls = fake_nvidia_smi(tmp_path)
+    backend = NvidiaSmiBackend(command=command, stream_ms=20)
+    backend.activate()
+    try:
+        deadline = time.monotonic() + 5
+        while backend.get_gpu_temp() != 52 and time.monotonic() < deadline:
+            backend.invalidate()
+            time.sleep(0.01)
+        assert (backend.get_gpu_temp(), backend.get_gpu_usage(), backend.get_gpu_speed()) == (52, 21, 1500)
+        # One long-lived child and at most one priming query, however many samples were read
+        lines = calls.read_text().splitlines()
+        assert len([line for line in lines if "--loop-ms=20" in line]) == 1
+        assert len(lines) <= 2
+    finally:
+        backend.close()
+
+
+class HangingBackend:
+    """Reads block while gate is cleared, like a driver call stuck on a lost GPU"""
+    name = "hanging"
+    deadline = 0.05
+
+    def __init__(self):
+        self.provides = {'gpu_temp': 'get_gpu_temp'}
+        self.value = 50
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def get_gpu_temp(self):
+        self.gate.wait()
+        return self.value
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_worker_quarantines_a_hanging_backend_and_recovers():
+    backend = HangingBackend()
+    clock = FakeClock()
+    worker = BackendWorker(backend, {'gpu_temp': backend.get_gpu_temp}, clock=clock)
+    assert worker.wait(worker.start(), 1.0)['gpu_temp'][0] == 50
+    backend.gate.clear()
+    try:
+        # The hung read is waited for once; the next samples don't queue another read behind it
+        assert worker.wait(worker.start(), 0.01) is None
+        for misses in (2, 3):
+            assert not worker.start()
+            assert worker.wait(False, 0.01) is None
+            assert worker.misses == misses
+        assert worker.get_stats() == {"deadline": 0.05, "timeouts": 3, "quarantined": True, "backoff": 5}
+        # Skipped while quarantined, without counting more misses
+        clock.now += 4.9
+        assert not worker.start() and worker.wait(False, 0.01) is None
+        assert worker.timeouts == 3
+        # Each miss after the backoff doubles it
+        for backoff in (10, 20):
+            clock.now = worker.quarantined_until
+            assert not worker.quarantined()
+            assert worker.wait(worker.start(), 0.01) is None
+            assert (worker.backoff, worker.quarantined_until) == (backoff, clock.now + backoff)
+    finally:
+        backend.gate.set()
+    assert worker.done.wait(1.0)
+    backend.value = 61
+    clock.now = worker.quarantined_until
+    assert worker.wait(worker.start(), 1.0)['gpu_temp'][0] == 61
+    assert (worker.misses, worker.backoff, worker.quarantined()) == (0, 0, False)
+
+
+def test_worker_counts_a_timeout_error_as_a_miss():
+    def get_gpu_temp():
+        raise TimeoutError("nvidia-smi stream stalled")
+    worker = BackendWorker(FunctionBackend("stalled", {'gpu_temp': get_gpu_temp}), {'gpu_temp': get_gpu_temp}, clock=FakeClock())
+    assert worker.wait(worker.start(), 1.0) is None
+    assert worker.misses == 1
+
+
+def test_sample_keeps_the_values_of_a_hanging_backend_and_marks_them_stale(tmp_path, monkeypatch):
+    backend = HangingBackend()
+    cpu_temp = [40]
+    monkeypatch.setenv('DIGITAL_LCD_CONFIG', str(tmp_path / 'missing.json'))
+    monkeypatch.setattr(metrics, 'builtin_backends', lambda m: [backend, FunctionBackend("fake", {'cpu_temp': lambda: cpu_temp[0]})])
+    monkeypatch.setattr(metrics, 'entry_point_backends', lambda m: [])
+    sampler = metrics.Metrics(probe_cache=str(tmp_path / 'probe.json'))
+    snapshot = sampler.sample()
+    assert (snapshot.values['gpu_temp'], snapshot.values['cpu_temp'], snapshot.stale) == (50, 40, frozenset())
+    backend.gate.clear()
+    try:
+        backend.value, cpu_temp[0] = 61, 45
+        snapshot = sampler.sample()
+        assert (snapshot.values['gpu_temp'], snapshot.values['cpu_temp'], snapshot.stale) == (50, 45, {'gpu_temp'})
+    finally:
+        backend.gate.set()
+
+
+def write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+def test_sysfs_reads_preferred_chip_and_average_frequency(tmp_path):
+    write(tmp_path / "sys/class/hwmon/hwmon0/name", "acpitz\n")
+    write(tmp_path / "sys/class/hwmon/hwmon0/temp1_input", "30000\n")
+    write(tmp_path / "sys/class/hwmon/hwmon1/name", "coretemp\n")
+    for index, millidegrees in ((1, 48000), (2, 55000), (10, 62000)):
+        write(tmp_path / f"sys/class/hwmon/hwmon1/temp{index}_input", f"{millidegrees}\n")
+    for cpu, khz in enumerate((3000000, 4000000)):
+        write(tmp_path / f"sys/devices/system/cpu/cpu{cpu}/cpufreq/scaling_cur_freq", f"{khz}\n")
+    backend = SysfsBackend(root=str(tmp_path))
+    try:
+        assert backend.get_cpu_temp() == 48.0
+        assert backend.get_cpu_temp_max() == 62.0
+        assert backend.get_cpu_speed() == 3500
+        # Files stay open and are re-read on each sample
+        write(tmp_path / "sys/class/hwmon/hwmon1/temp1_input", "51000\n")
+        assert backend.get_cpu_temp() == 51.0
+    finally:
+        backend.close()
+
+
+def test_sysfs_without_sensors(tmp_path):
+    backend = SysfsBackend(root=str(tmp_path))
+    assert (backend.get_cpu_temp(), backend.get_cpu_temp_max(), backend.get_cpu_speed()) == (None, None, None)
+
+
+def proc_stat(*rows):
+    lines = [f"cpu{name} " + " ".join(str(value) for value in values) + " 0 0" for name, values in rows]
+    return "\n".join(lines) + "\nintr 12345\n"
+
+
+def test_proc_stat_usage_from_counter_deltas(tmp_path):
+    path = tmp_path / "stat"
+    # user nice system idle iowait irq softirq steal
+    path.write_text(proc_stat(("", (100, 0, 100, 800, 0, 0, 0, 0)),
+                              ("0", (50, 0, 50, 400, 0, 0, 0, 0)),
+                              ("1", (50, 0, 50, 400, 0, 0, 0, 0))))
+    backend = ProcStatBackend(path=str(path))
+    try:
+        # First sample: average since boot
+        assert backend.get_cpu_usage() == 20.0
+        path.write_text(proc_stat(("", (200, 0, 150, 850, 0, 0, 0, 0)),
+                                  ("0", (140, 0, 50, 410, 0, 0, 0, 0)),
+                                  ("1", (60, 0, 100, 440, 0, 0, 0, 0))))
+        backend.invalidate()
+        assert backend.get_cpu_usage() == 75.0
+        assert backend.get_cpu_usage_max() == 90.0
+        assert backend.busiest_core == 0
+    finally:
+        backend.close()
+
+
+def test_fingerprint_changes_when_a_vendor_binding_is_installed(monkeypatch):
+    monkeypatch.setattr(metrics, "vendor_module_available", lambda module: False)
+    before = metrics.hardware_fingerprint("nvidia")
+    monkeypatch.setattr(metrics, "vendor_module_available", lambda module: module == "pynvml")
+    assert metrics.hardware_fingerprint("nvidia") != before
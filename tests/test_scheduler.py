@@ -0,0 +1,35 @@
+import pytest
+
+from scheduler import FrameScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_wake_reanchors_the_deadlines():
+    clock = FakeClock()
+    scheduler = FrameScheduler(1.0, clock=clock, sleep=clock.sleep)
+    timeouts = []
+
+    def wake(timeout):
+        # A new snapshot is published 0.3 s into the wait
+        timeouts.append(timeout)
+        clock.now += 0.3
+        return True
+    scheduler.begin_frame()
+    clock.now += 0.1
+    scheduler.end_frame(wake)
+    assert clock.now == pytest.approx(0.4)
+    assert timeouts == [pytest.approx(0.9)]
+    scheduler.begin_frame()
+    scheduler.end_frame(lambda timeout: timeouts.append(timeout) or False)
+    assert timeouts[-1] == pytest.approx(1.0)
+    assert scheduler.get_stats()["wakeups"] == 1
@@ -0,0 +1,110 @@
+import copy
+import json
+import os
+
+import numpy as np
+import pytest
+
+from config import NUMBER_OF_LEDS
+from segments import SegmentLayout, digit_to_segments
+
+LAYOUT_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'layout.json')
+
+
+@pytest.fixture(scope="module")
+def layout_json():
+    with open(LAYOUT_PATH) as f:
+        return json.load(f)
+
+
+class LegacyDrawing:
+    """The draw_number based drawing the controller used before SegmentLayout, on the raw layout.json"""
+    def __init__(self, layout):
+        self.layout = layout
+        self.leds = np.zeros(NUMBER_OF_LEDS, dtype=int)
+
+    def draw_number(self, number, num_digits, digits_mapping):
+        number_str = f"{number:0{num_digits}d}"
+        for i, digit_char in enumerate(number_str):
+            if i < len(digits_mapping):
+                digit = int(digit_char)
+                segments_to_light = digit_to_segments[digit]
+                digit_map = digits_mapping[i]['map']
+                for segment_name in segments_to_light:
+                    segment_index = digit_map[segment_name]
+                    self.leds[segment_index] = 1
+
+    def draw_usage(self, usage):
+        usage_2digit = usage % 100
+        if len(self.layout['usage_1s_digit']) > 0:
+            self.draw_number(usage_2digit % 10, 1, self.layout['usage_1s_digit'])
+        if usage_2digit >= 10 and len(self.layout['usage_10s_digit']) > 0:
+            self.draw_number(usage_2digit // 10, 1, self.layout['usage_10s_digit'])
+
+    def draw_speed(self, speed):
+        if len(self.layout['speed_digits']) >= 4:
+            self.draw_number(speed % 10, 1, [self.layout['speed_digits'][0]])
+            if speed >= 10:
+                self.draw_number((speed // 10) % 10, 1, [self.layout['speed_digits'][1]])
+            if speed >= 100:
+                self.draw_number((speed // 100) % 10, 1, [self.layout['speed_digits'][2]])
+            if speed >= 1000:
+                self.draw_number(speed // 1000, 1, [self.layout['speed_digits'][3]])
+
+    def draw_temp(self, temp):
+        if len(self.layout['temp_1s_digit']) > 0:
+            self.draw_number(temp % 10, 1, self.layout['temp_1s_digit'])
+        if temp >= 10 and len(self.layout['temp_10s_digit']) > 0:
+            self.draw_number((temp // 10) % 10, 1, self.layout['temp_10s_digit'])
+        if temp >= 100 and len(self.layout['temp_100s_digit']) > 0:
+            self.draw_number(temp // 100, 1, self.layout['temp_100s_digit'])
+
+
+@pytest.mark.parametrize("number, values, draw_value", [
+    ("usage", range(200), lambda usage: usage % 100),
+    ("speed", range(10000), lambda speed: speed),
+    ("temp", range(1000), lambda temp: temp),
+])
+def test_draw_matches_draw_number(layout_json, number, values, draw_value):
+    layout = SegmentLayout(layout_json)
+    for value in values:
+        legacy = LegacyDrawing(layout_json)
+        getattr(legacy, f"draw_{number}")(value)
+        leds = np.zeros(NUMBER_OF_LEDS, dtype=int)
+        layout.draw(leds, number, draw_value(value))
+        assert np.array_equal(leds, legacy.leds), f"{number} {value}"
+
+
+def test_single_leds_are_resolved(layout_json):
+    layout = SegmentLayout(layout_json)
+    assert layout.usage_percent_led == layout_json["usage_percent_led"]
+    assert layout.temp_celsius == layout_json["temp_celsius"]
+
+
+def test_duplicate_led_index_is_rejected(layout_json):
+    broken = copy.deepcopy(layout_json)
+    broken["temp_celsius"] = broken["temp_fahrenheit"]
+    with pytest.raises(ValueError, match="already used by temp_fahrenheit"):
+        SegmentLayout(broken)
+
+
+@pytest.mark.parametrize("index", [-1, NUMBER_OF_LEDS, "3", True])
+def test_out_of_range_led_index_is_rejected(layout_json, index):
+    broken = copy.deepcopy(layout_json)
+    broken["speed_digits"][2]["map"]["e"] = index
+    with pytest.raises(ValueError, match=r"speed_digits\[2\]\.e"):
+        SegmentLayout(broken)
+
+
+def test_missing_segment_is_rejected(layout_json):
+    broken = copy.deepcopy(layout_json)
+    del broken["temp_10s_digit"][0]["map"]["g"]
+    with pytest.raises(ValueError, match=r"temp_10s_digit\[0\] has no LED for segments \['g'\]"):
+        SegmentLayout(broken)
+
+
+def test_missing_key_is_rejected(layout_json):
+    broken = copy.deepcopy(layout_json)
+    del broken["usage_100s_led"]
+    with pytest.raises(ValueError, match="missing key usage_100s_led"):
+        SegmentLayout(broken)